@@ -0,0 +1,95 @@
+"""Requests per second of /api/v1/available-forecast-dates.json through the Flask test client.
+
+    python -m bench.available_dates --duration 5
+
+Each mode sends requests one after the other for --duration seconds, against the configured database:
+
+- before: only the query of the original endpoint, the latest warning row by init_date loaded as an ORM object
+- uncached: the endpoint with its memos cleared before each request, so that each one reads aemet_latest_forecast
+- cached: the endpoint as served, its memo read from the database once every API_CACHE_TTL seconds
+- conditional: the same with the ETag of the previous response, answered 304
+
+--no-db stands in for the database with the latest forecasts of seven countries, so that the cached and
+conditional modes can be measured without it.
+"""
+import argparse
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy import desc
+
+from dustwarning import app, db
+from dustwarning import queries
+from dustwarning.models import DustWarning
+
+URL = "/api/v1/available-forecast-dates.json"
+DB_MODES = ["before", "uncached"]
+MODES = DB_MODES + ["cached", "conditional"]
+
+
+def run(mode, client, duration):
+    latencies = []
+    headers = {}
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+
+        if mode == "before":
+            DustWarning.query.order_by(desc(DustWarning.init_date)).first()
+        else:
+            if mode == "uncached":
+                queries.get_latest_forecasts.cache_clear()
+                queries.available_dates_cache.clear()
+
+            response = client.get(URL, headers=headers)
+            assert response.status_code in (200, 304), response.status_code
+
+            if mode == "conditional":
+                headers = {"If-None-Match": response.headers["ETag"]}
+
+        latencies.append(time.perf_counter() - start)
+
+        if mode == "before":
+            db.session.rollback()
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=5, help="Seconds of requests in each mode")
+    parser.add_argument("--no-db", action="store_true", help="Serve synthetic latest forecasts instead")
+    parser.add_argument("modes", nargs="*", help=f"Among {', '.join(MODES)}, all of them by default")
+    args = parser.parse_args()
+
+    if set(args.modes) - set(MODES):
+        parser.error(f"Unknown modes {', '.join(sorted(set(args.modes) - set(MODES)))}")
+
+    modes = args.modes or [mode for mode in MODES if not (args.no_db and mode in DB_MODES)]
+
+    with ExitStack() as stack:
+        if args.no_db:
+            init_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+            latest = {iso: (init_date, init_date + timedelta(hours=12))
+                      for iso in ["BFA", "CPV", "MLI", "MRT", "NER", "SEN", "TCD"]}
+            stack.enter_context(mock.patch.object(queries, "get_latest_forecasts", lambda: latest))
+
+        stack.enter_context(app.app_context())
+        client = stack.enter_context(app.test_client())
+
+        print(f"{'mode':<12} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+
+        for mode in modes:
+            latencies = run(mode, client, args.duration)
+            percentiles = statistics.quantiles(latencies, n=100)
+
+            print(f"{mode:<12} {len(latencies):>9} {len(latencies) / sum(latencies):>9.0f} "
+                  f"{percentiles[49] * 1000:>8.2f} {percentiles[94] * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
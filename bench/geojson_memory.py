@@ -0,0 +1,104 @@
+"""Peak memory of parsing a large GeoJSON file, streamed by iter_geojson_features or read whole by json.load.
+
+    python -m bench.geojson_memory --scale 20
+
+It writes a synthetic FeatureCollection holding the features of every bundled boundary file, --scale times over,
+then parses it in a new interpreter with each parser, reading the properties of every feature like
+parse_warnings does. It prints the peak RSS of each process above that of a process which only imports the
+modules, and the parse time.
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BOUNDARY_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "dustwarning", "boundary_data")
+
+PARSERS = ["none", "json.load", "iter_geojson_features"]
+
+
+def write_synthetic_file(path, scale):
+    """Write the bundled features scale times over, one at a time, returning their count"""
+    features = []
+    for boundary_file in sorted(glob.glob(os.path.join(BOUNDARY_DATA_DIR, "*.geojson"))):
+        with open(boundary_file) as f:
+            features.extend(json.load(f)["features"])
+
+    with open(path, "w") as f:
+        f.write('{"type": "FeatureCollection", "features": [')
+
+        for i in range(scale):
+            for j, feature in enumerate(features):
+                if i or j:
+                    f.write(",")
+                feature["properties"]["value"] = (i + j) % 4
+                json.dump(feature, f)
+
+        f.write("]}")
+
+    return scale * len(features)
+
+
+def parse(parser, path):
+    """Parse the file in this process, printing the feature count, the parse seconds and the peak RSS in KiB"""
+    from dustwarning.utils import iter_geojson_features
+
+    count = 0
+    start = time.perf_counter()
+
+    with open(path, "rb") as f:
+        if parser == "json.load":
+            features = json.load(f)["features"]
+        elif parser == "iter_geojson_features":
+            features = iter_geojson_features(f)
+        else:
+            features = []
+
+        for feature in features:
+            feature["properties"].get("value")
+            count += 1
+
+    elapsed = time.perf_counter() - start
+    # in KiB on Linux
+    print(json.dumps([count, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=20, help="Copies of the bundled boundary features")
+    parser.add_argument("--parse", choices=PARSERS, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.parse:
+        return parse(args.parse, args.path)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "warnings.geojson")
+        count = write_synthetic_file(path, args.scale)
+
+        print(f"{count} features, {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        print(f"{'parser':<24} {'peak RSS MiB':>12} {'seconds':>8}")
+
+        baseline = None
+
+        for name in PARSERS:
+            result = subprocess.run([sys.executable, "-m", "bench.geojson_memory", "--parse", name, "--path", path],
+                                    capture_output=True, text=True, check=True)
+            _, elapsed, max_rss = json.loads(result.stdout.splitlines()[-1])
+
+            if baseline is None:
+                baseline = max_rss
+                continue
+
+            print(f"{name:<24} {(max_rss - baseline) / 1024:>12.1f} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
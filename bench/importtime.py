@@ -0,0 +1,79 @@
+"""Cold start import time of the ingestion commands, from `python -X importtime`.
+
+    python -m bench.importtime
+    python -m bench.importtime --path /tmp/before dustwarning.commands
+
+Each run imports the modules in a new interpreter, --repeat times, and prints the median of the total import time
+reported by -X importtime and of the wall time of the process, then the import time spent in each top level
+package. --path points PYTHONPATH to another checkout, so that a commit can be compared with an earlier one
+checked out with `git worktree add /tmp/before <commit>`. The settings are read from the environment as usual,
+STATE_DIR and SQLALCHEMY_DATABASE_URI being required, though nothing connects to the database.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+DEFAULT_MODULES = ["dustwarning.cli", "dustwarning.commands"]
+# packages worth knowing whether a command pulls in
+WATCHED = ["flask_cors", "flask_migrate", "healthcheck", "graypy", "geoalchemy2", "shapely", "numpy", "pyarrow"]
+
+
+def measure(modules, path):
+    """Total import microseconds, wall seconds, microseconds by top level package, and the watched packages loaded"""
+    code = f"import sys; import {', '.join(modules)}; " \
+           f"print(__import__('json').dumps([name for name in {WATCHED!r} if name in sys.modules]))"
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=path, capture_output=True,
+                            text=True, env={**os.environ, "PYTHONPATH": path})
+    wall = time.perf_counter() - start
+
+    if result.returncode:
+        sys.exit(result.stderr)
+
+    total = 0
+    by_package = defaultdict(int)
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        by_package[name.strip().split(".")[0]] += int(self_us)
+
+        # the modules imported by the command line, everything else being nested under them
+        if name.strip() in modules:
+            total += int(cumulative_us)
+
+    return total, wall, by_package, json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--path", default=os.getcwd(), help="Checkout to import from, the current one by default")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="Packages listed, the slowest to import first")
+    args = parser.parse_args()
+
+    runs = [measure(args.modules, os.path.abspath(args.path)) for _ in range(args.repeat)]
+
+    print(f"import {', '.join(args.modules)} from {args.path}, median of {args.repeat} runs")
+    print(f"{'import time':<24} {statistics.median(run[0] for run in runs) / 1000:>8.0f} ms")
+    print(f"{'process wall time':<24} {statistics.median(run[1] for run in runs) * 1000:>8.0f} ms")
+    print(f"{'loaded':<24} {', '.join(runs[0][3]) or '-'}")
+    print()
+
+    packages = {name: statistics.median(run[2].get(name, 0) for run in runs) for name in runs[0][2]}
+
+    for name, us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<24} {us / 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
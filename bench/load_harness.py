@@ -0,0 +1,105 @@
+"""Concurrency and latency of the read API, to compare the sync and async deployments.
+
+Serve the same database both ways, for instance
+
+    gunicorn --bind 0.0.0.0:8000 --workers 4 dustwarning:app
+    gunicorn --bind 0.0.0.0:8001 --workers 4 -k uvicorn.workers.UvicornWorker dustwarning.asgi:application
+
+then run
+
+    python -m bench.load_harness http://localhost:8000 http://localhost:8001 --concurrency 1 8 32 128
+
+Each server is loaded in turn at each concurrency for --duration seconds, by that many threads requesting the
+available dates and the warnings of every country and forecast date it lists, in a loop. It prints the requests
+per second and the median and 95th percentile latencies of each, the curve of a server being its rows.
+"""
+import argparse
+import itertools
+import statistics
+import threading
+import time
+
+import requests
+
+
+def get_paths(base_url):
+    """The read endpoints of the API, the warning paths taken from the available dates"""
+    paths = ["/api/v1/available-forecast-dates.json"]
+
+    response = requests.get(base_url + paths[0], timeout=30)
+    response.raise_for_status()
+
+    for iso, country in response.json()["countries"].items():
+        paths.extend(f"/api/v1/warnings/{iso}/{timestamp[:10]}.json" for timestamp in country["timestamps"])
+
+    return paths
+
+
+def run_level(base_url, paths, concurrency, duration):
+    """Latencies of the requests made by concurrency threads for duration seconds, and the count of errors"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(offset):
+        own_latencies = []
+        own_errors = 0
+
+        with requests.Session() as session:
+            # the threads start at different paths, so that they do not all hit the same one at once
+            for path in itertools.islice(itertools.cycle(paths), offset, None):
+                if time.monotonic() >= deadline:
+                    break
+
+                start = time.perf_counter()
+                try:
+                    response = session.get(base_url + path, timeout=30)
+                    if response.status_code >= 500:
+                        own_errors += 1
+                except requests.RequestException:
+                    own_errors += 1
+                own_latencies.append(time.perf_counter() - start)
+
+        with lock:
+            latencies.extend(own_latencies)
+            errors.append(own_errors)
+
+    threads = [threading.Thread(target=worker, args=(i % len(paths),)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return latencies, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base_urls", nargs="+", help="Base url of each server, e.g. http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load at each concurrency")
+    args = parser.parse_args()
+
+    print(f"{'server':<32} {'threads':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+
+    for base_url in args.base_urls:
+        base_url = base_url.rstrip("/")
+        paths = get_paths(base_url)
+
+        for concurrency in args.concurrency:
+            latencies, errors = run_level(base_url, paths, concurrency, args.duration)
+
+            if len(latencies) < 2:
+                print(f"{base_url:<32} {concurrency:>8} {len(latencies):>9} {errors:>7}")
+                continue
+
+            percentiles = statistics.quantiles(latencies, n=100)
+
+            print(f"{base_url:<32} {concurrency:>8} {len(latencies):>9} {errors:>7} "
+                  f"{len(latencies) / args.duration:>9.1f} {percentiles[49] * 1000:>8.1f} "
+                  f"{percentiles[94] * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
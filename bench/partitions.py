@@ -0,0 +1,142 @@
+"""Tile latency over several years of history, on the partitioned warnings table and on an unpartitioned copy.
+
+    python -m bench.partitions --years 5
+
+It runs against the configured database, once the boundaries are loaded. Every region is given --years of daily
+runs with three lead days from 2095 on, in monthly partitions created like load_warnings does. The whole table,
+real rows included, is then copied into an unpartitioned table with the same indexes, and both are analyzed.
+Every z0 to --max-zoom tile of each country is rendered from each table with the query of the tile function,
+for the latest synthetic init_date and for one a year earlier. Everything runs in one transaction that is
+rolled back.
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.sql import text
+
+from dustwarning import db
+from dustwarning.cli import create_cli_app
+from dustwarning.helpers import SIMPLIFIED_GEOMETRIES
+from dustwarning.models import Boundary
+from dustwarning.partitions import ensure_warning_partition, month_start, next_month
+from dustwarning.tiles import get_country_bounds, iter_tiles
+
+FIRST_INIT_DATE = datetime(2095, 1, 1)
+FLAT_TABLE = "aemet.bench_dust_warning_flat"
+
+SEED_SQL = text("""
+    INSERT INTO aemet.aemet_dust_warning (gid, init_date, forecast_date, value)
+    SELECT b.gid, d, d + lead * interval '1 day', floor(random() * 4)::integer
+    FROM aemet.aemet_country_boundary b,
+        generate_series(CAST(:start AS timestamp), CAST(:end AS timestamp), interval '1 day') d,
+        generate_series(0, 2) lead
+""")
+
+# pick the simplified geometry matching the zoom, as public.aemet_dust_warnings does
+ZOOM_CASES = " ".join(f"WHEN :z <= {max_zoom} THEN COALESCE(s.{column}, s.geom_3857)"
+                      for column, _, max_zoom in SIMPLIFIED_GEOMETRIES)
+
+# the query of public.aemet_dust_warnings, the table and init_date being given
+TILE_SQL = f"""
+    WITH
+    bounds AS (
+        SELECT ST_TileEnvelope(:z, :x, :y) AS geom
+    ),
+    mvt AS (
+        SELECT
+            ST_AsMVTGeom(CASE {ZOOM_CASES} ELSE s.geom_3857 END, bounds.geom) AS geom,
+            s.name,
+            o.*
+        FROM {{table}} o, bounds, aemet.aemet_country_boundary s
+        WHERE s.country_iso = :iso AND s.geom_3857 && bounds.geom
+            AND o.gid = s.gid AND o.init_date = :init_date AND o.forecast_date = :init_date
+    )
+    SELECT ST_AsMVT(mvt, 'default') FROM mvt
+"""
+
+TABLES = {
+    "partitioned": "aemet.aemet_dust_warning",
+    "unpartitioned": FLAT_TABLE,
+}
+
+
+def seed(years):
+    last_init_date = FIRST_INIT_DATE + timedelta(days=365 * years - 1)
+
+    month = month_start(FIRST_INIT_DATE)
+    while month <= last_init_date.date():
+        ensure_warning_partition(month)
+        month = next_month(month)
+
+    # the forecast of the last lead days ends in the month after
+    ensure_warning_partition(month)
+
+    start = time.perf_counter()
+    rows = db.session.execute(SEED_SQL, {"start": FIRST_INIT_DATE, "end": last_init_date}).rowcount
+
+    db.session.execute(text(f"CREATE TABLE {FLAT_TABLE} "
+                            f"(LIKE aemet.aemet_dust_warning INCLUDING DEFAULTS INCLUDING INDEXES)"))
+    db.session.execute(text(f"INSERT INTO {FLAT_TABLE} SELECT * FROM aemet.aemet_dust_warning"))
+    db.session.execute(text(f"ANALYZE {FLAT_TABLE}"))
+    db.session.execute(text("ANALYZE aemet.aemet_dust_warning"))
+
+    print(f"Seeded {rows} rows up to {last_init_date:%Y-%m-%d} in {time.perf_counter() - start:.1f} s")
+
+    return last_init_date
+
+
+def render(table, tiles, init_date):
+    stmt = text(TILE_SQL.format(table=table))
+    latencies = []
+
+    for iso, z, x, y in tiles:
+        start = time.perf_counter()
+        db.session.execute(stmt, {"iso": iso, "init_date": init_date, "z": z, "x": x, "y": y}).scalar()
+        latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--max-zoom", type=int, default=6)
+    args = parser.parse_args()
+
+    with create_cli_app().app_context():
+        try:
+            country_isos = db.session.execute(select(Boundary.country_iso).distinct()).scalars().all()
+
+            if not country_isos:
+                raise SystemExit("No boundaries loaded")
+
+            regions = db.session.execute(select(func.count()).select_from(Boundary)).scalar()
+            print(f"{regions} regions of {len(country_isos)} countries")
+
+            last_init_date = seed(args.years)
+
+            tiles = [(iso, z, x, y) for iso in country_isos
+                     for z, x, y in iter_tiles(get_country_bounds(iso), 0, args.max_zoom)]
+
+            print(f"{len(tiles)} tiles of z0 to z{args.max_zoom}")
+            print(f"{'table':<14} {'init_date':<11} {'tiles/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+
+            for init_date in (last_init_date, last_init_date - timedelta(days=365)):
+                for name, table in TABLES.items():
+                    # a few tiles first to warm the caches of Postgres
+                    render(table, tiles[:20], init_date)
+                    latencies = render(table, tiles, init_date)
+
+                    percentiles = statistics.quantiles(latencies, n=100)
+
+                    print(f"{name:<14} {init_date:%Y-%m-%d}  {len(tiles) / sum(latencies):>9.1f} "
+                          f"{percentiles[49] * 1000:>8.2f} {percentiles[94] * 1000:>8.2f}")
+        finally:
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    main()
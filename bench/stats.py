@@ -0,0 +1,81 @@
+"""Time of the climatology statistics over a long synthetic history.
+
+    python -m bench.stats --regions 100 --years 12
+
+It seeds the history cache with a synthetic country of --regions regions over --years of daily runs and three lead
+days, a tenth of the values missing, so that nothing is read from the database. The 81 bundled regions in a
+single country are an upper bound of any real one. get_country_stats is then timed once to warm up and --repeat
+times per query, the stats cache being cleared before each call so that every call recomputes from the arrays.
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+import numpy as np
+
+from dustwarning.stats import LEAD_DAYS, MISSING, WarningsHistory, get_country_stats, history_cache, stats_cache
+
+ISO = "ZZZ"
+INIT_DATE = datetime(2099, 1, 1)
+UPDATED_AT = datetime(2099, 1, 1, 12)
+
+
+def make_history(regions, years, seed=0):
+    rng = np.random.default_rng(seed)
+
+    dates = np.datetime64("2099-01-01") - np.arange(years * 365)[::-1]
+    values = rng.choice(np.array([0, 1, 2, 3], dtype=np.int8), p=[0.6, 0.2, 0.15, 0.05],
+                        size=(regions, len(dates), LEAD_DAYS))
+    values[rng.random(values.shape) < 0.1] = MISSING
+
+    gids = [f"{ISO}_{i}" for i in range(regions)]
+
+    return WarningsHistory(gids, gids, dates, values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--regions", type=int, default=100)
+    parser.add_argument("--years", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    history = make_history(args.regions, args.years)
+    history_cache.set((ISO, INIT_DATE, UPDATED_AT), history)
+
+    last_year = datetime(2098, 1, 1)
+    queries = {
+        "whole history, lead 0": {},
+        "whole history, lead 2": {"lead": 2},
+        "last year, lead 0": {"start": last_year},
+    }
+
+    print(f"{args.regions} regions x {history.values.shape[1]} days x {LEAD_DAYS} leads, "
+          f"{history.values.nbytes / 2 ** 20:.1f} MiB")
+
+    start = time.perf_counter()
+    get_country_stats(ISO, INIT_DATE, UPDATED_AT)
+    print(f"{'warm-up':<24} {(time.perf_counter() - start) * 1000:>8.1f} ms")
+
+    for label, params in queries.items():
+        timings = []
+
+        for _ in range(args.repeat):
+            stats_cache.clear()
+
+            start = time.perf_counter()
+            get_country_stats(ISO, INIT_DATE, UPDATED_AT, **params)
+            timings.append(time.perf_counter() - start)
+
+        print(f"{label:<24} {statistics.median(timings) * 1000:>8.1f} ms median {max(timings) * 1000:>8.1f} ms max")
+
+    get_country_stats(ISO, INIT_DATE, UPDATED_AT)
+
+    start = time.perf_counter()
+    get_country_stats(ISO, INIT_DATE, UPDATED_AT)
+    print(f"{'cached':<24} {(time.perf_counter() - start) * 1000:>8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Rendering speed of the vector tile pyramid of every country, before and after the precomputed geometries.
+
+    python -m bench.tiles --max-zoom 8
+
+It runs against the configured database, once the boundaries and a forecast are loaded. Every tile from --min-zoom
+to --max-zoom covering each country is rendered for the first forecast date of its latest init_date, one at a time:
+
+- before: the tile query of the original function, transforming the full resolution boundaries on each tile, and
+  joining every region of the country whatever the tile
+- after: public.aemet_dust_warnings, reading geom_3857 or the simplified geometry of the zoom and only the regions
+  intersecting the tile
+- cached: the tile cache read by the API, filled by pregenerate_tiles
+
+For each it prints the tiles per second and the median and 95th percentile latencies.
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import select
+from sqlalchemy.sql import text
+
+from dustwarning import db
+from dustwarning.cli import create_cli_app
+from dustwarning.models import LatestForecast
+from dustwarning.queries import TILE_STMT
+from dustwarning.tiles import get_country_bounds, iter_tiles
+
+# the body of the original public.aemet_dust_warnings, which looked up the latest init_date of any country
+BEFORE_SQL = text("""
+    WITH
+    bounds AS (
+        SELECT ST_TileEnvelope(:z, :x, :y) AS geom
+    ),
+    mvt AS (
+        SELECT
+            ST_AsMVTGeom(ST_Transform(s.geom, 3857), bounds.geom) AS geom,
+            s.name,
+            o.*,
+            CASE
+                WHEN o.value = 0 THEN 'Normal'
+                WHEN o.value = 1 THEN 'High'
+                WHEN o.value = 2 THEN 'Very High'
+                WHEN o.value = 3 THEN 'Extremely High'
+                ELSE 'Unknown'
+            END AS level
+        FROM aemet.aemet_dust_warning o, bounds, aemet.aemet_country_boundary s
+        WHERE s.country_iso = :iso AND o.gid = s.gid AND o.forecast_date = :forecast_date
+            AND o.init_date = (SELECT MAX(init_date) FROM aemet.aemet_dust_warning)
+    )
+    SELECT ST_AsMVT(mvt, 'default') FROM mvt
+""")
+
+AFTER_SQL = text("SELECT public.aemet_dust_warnings(:z, :x, :y, :iso, :forecast_date)")
+
+VARIANTS = {
+    "before": BEFORE_SQL,
+    "after": AFTER_SQL,
+    "cached": TILE_STMT,
+}
+
+
+def get_pyramid(min_zoom, max_zoom):
+    """(iso, forecast_date, z, x, y) of every tile of the latest forecast of each country"""
+    tiles = []
+
+    for latest_forecast in db.session.execute(select(LatestForecast)).scalars().all():
+        bounds = get_country_bounds(latest_forecast.country_iso)
+
+        if bounds is None:
+            continue
+
+        tiles.extend((latest_forecast.country_iso, latest_forecast.init_date, z, x, y)
+                     for z, x, y in iter_tiles(bounds, min_zoom, max_zoom))
+
+    return tiles
+
+
+def render(stmt, tiles):
+    latencies = []
+    size = 0
+
+    for iso, forecast_date, z, x, y in tiles:
+        start = time.perf_counter()
+        tile = db.session.execute(stmt, {"iso": iso, "forecast_date": forecast_date, "z": z, "x": x, "y": y}) \
+            .scalar()
+        latencies.append(time.perf_counter() - start)
+
+        size += len(tile or b"")
+
+    return latencies, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-zoom", type=int, default=0)
+    parser.add_argument("--max-zoom", type=int, default=8)
+    parser.add_argument("variants", nargs="*", help=f"Among {', '.join(VARIANTS)}, all of them by default")
+    args = parser.parse_args()
+
+    if set(args.variants) - set(VARIANTS):
+        parser.error(f"Unknown variants {', '.join(sorted(set(args.variants) - set(VARIANTS)))}")
+
+    with create_cli_app().app_context():
+        tiles = get_pyramid(args.min_zoom, args.max_zoom)
+
+        if len(tiles) < 2:
+            raise SystemExit("No forecast loaded to render")
+
+        print(f"{len(tiles)} tiles of z{args.min_zoom} to z{args.max_zoom}, "
+              f"{len({tile[0] for tile in tiles})} countries")
+        print(f"{'variant':<10} {'tiles/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'MiB':>8}")
+
+        for variant in args.variants or VARIANTS:
+            # a few tiles first to warm the caches of Postgres
+            render(VARIANTS[variant], tiles[:50])
+            latencies, size = render(VARIANTS[variant], tiles)
+
+            percentiles = statistics.quantiles(latencies, n=100)
+
+            print(f"{variant:<10} {len(tiles) / sum(latencies):>9.1f} {percentiles[49] * 1000:>8.1f} "
+                  f"{percentiles[94] * 1000:>8.1f} {size / 2 ** 20:>8.2f}")
+
+        db.session.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Rows per second of the warning upsert, against the configured database.
+
+    python -m bench.upsert_rows --regions 10000
+
+It loads a synthetic payload of --regions regions over three forecast days, first row by row like the former
+load_warnings did (a lookup then an insert per row, on a sample of --per-row rows), then through upsert_warnings,
+inserting, changing and reloading the same rows. Everything runs in one transaction that is rolled back, the
+synthetic boundaries included. The row by row path is timed with a savepoint per row instead of its commit, so
+its rate leaves out the fsync of each commit and is an upper bound.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from dustwarning import db
+from dustwarning.cli import create_cli_app
+from dustwarning.helpers import upsert_warnings
+from dustwarning.models import Boundary, DustWarning
+from dustwarning.partitions import ensure_warning_partition
+
+COUNTRY_ISO = "ZZZ"
+# far from any real init_date, in a partition of its own
+INIT_DATE = datetime(2099, 1, 1)
+
+
+def make_rows(gids, init_date, value):
+    return [{"gid": gid, "init_date": init_date, "forecast_date": init_date + timedelta(days=day), "value": value}
+            for gid in gids for day in range(3)]
+
+
+def insert_boundaries(gids):
+    # a 0.1 degree square each, the geometry being required
+    db.session.execute(insert(Boundary.__table__).values([
+        {"gid": gid, "country_iso": COUNTRY_ISO, "name": gid,
+         "geom": func.ST_Multi(func.ST_MakeEnvelope(i % 100 * 0.1, i // 100 * 0.1,
+                                                    i % 100 * 0.1 + 0.1, i // 100 * 0.1 + 0.1, 4326))}
+        for i, gid in enumerate(gids)
+    ]))
+
+
+def load_row_by_row(rows):
+    for row in rows:
+        with db.session.begin_nested():
+            warning = DustWarning.query.filter_by(init_date=row["init_date"], forecast_date=row["forecast_date"],
+                                                  gid=row["gid"]).first()
+            if warning:
+                warning.value = row["value"]
+            else:
+                db.session.add(DustWarning(**row))
+
+
+def timed(label, rows, load):
+    start = time.perf_counter()
+    written = load(rows)
+    elapsed = time.perf_counter() - start
+
+    written = len(rows) if written is None else len(written)
+    print(f"{label:<28} {len(rows):>8} rows {written:>8} written {elapsed:>8.3f} s "
+          f"{len(rows) / elapsed:>10.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--regions", type=int, default=10000, help="Synthetic regions, three rows each")
+    parser.add_argument("--per-row", type=int, default=1000, help="Regions loaded row by row")
+    args = parser.parse_args()
+
+    gids = [f"{COUNTRY_ISO}_{i}" for i in range(args.regions)]
+
+    with create_cli_app().app_context():
+        try:
+            insert_boundaries(gids)
+            ensure_warning_partition(INIT_DATE)
+            db.session.flush()
+
+            # an init_date of its own, so that the batched path starts from an empty one too
+            timed("row by row (insert)", make_rows(gids[:args.per_row], INIT_DATE + timedelta(days=10), 1),
+                  load_row_by_row)
+
+            timed("upsert_warnings (insert)", make_rows(gids, INIT_DATE, 1), upsert_warnings)
+            timed("upsert_warnings (change)", make_rows(gids, INIT_DATE, 2), upsert_warnings)
+            timed("upsert_warnings (reload)", make_rows(gids, INIT_DATE, 2), upsert_warnings)
+        finally:
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    main()
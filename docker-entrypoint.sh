@@ -12,8 +12,10 @@ flask create_pg_function
 #ensure environment-variables are available for cronjob
 printenv | grep -v "no_proxy" >>/etc/environment
 
-# ensure cron is running
-service cron start
-service cron status
+# ensure cron is running, unless warnings are loaded by the scheduler service
+if [ "$INGESTION_MODE" != "scheduler" ]; then
+  service cron start
+  service cron status
+fi
 
 exec "$@"
@@ -0,0 +1,139 @@
+"""Threshold alerts, evaluated by load_warnings on the warning rows each load writes.
+
+A subscription alerts when one of the regions of its country, or its single region, is forecast at or above its
+threshold on one of its lead days. The evaluation is a single INSERT ... SELECT joining the rows written by the load
+with the active subscriptions, so that its cost follows the size of the load and not the subscriptions times the
+history. A region is notified once per subscription and forecast date, later runs forecasting it again being dropped
+by the unique key of the notifications. The new notifications are then handed to the sink of their subscription.
+"""
+import logging
+from collections import defaultdict
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from dustwarning import db
+from dustwarning.mapping import warning_levels
+from dustwarning.models import Boundary, DustWarning, Notification, Subscription, WebhookDelivery
+from dustwarning.queries import DATE_FORMAT
+
+ALERT_EVENT = "alert"
+
+# sink name -> function delivering the notifications of a subscription
+NOTIFICATION_SINKS = {}
+
+
+def notification_sink(name):
+    """Register a function as the sink of the subscriptions with that sink name.
+
+    It is called with the subscription and the alert payload, inside the load transaction, so that anything it
+    writes to the database commits along with the notifications.
+    """
+
+    def decorator(func):
+        NOTIFICATION_SINKS[name] = func
+        return func
+
+    return decorator
+
+
+@notification_sink("log")
+def log_sink(subscription, payload):
+    regions = ", ".join(f"{region['name']} ({region['level']} on {region['forecast_date'][:10]})"
+                        for region in payload["regions"])
+
+    logging.info(f"[ALERTS]: {subscription.name}: {regions}",
+                 extra={"subscription_id": subscription.id, "init_date": payload["init_date"],
+                        "regions": len(payload["regions"])})
+
+
+@notification_sink("webhook")
+def webhook_sink(subscription, payload):
+    if not subscription.target:
+        logging.warning(f"[ALERTS]: Subscription {subscription.id} has no webhook url, dropping its notifications")
+        return
+
+    # posted by deliver_webhooks, along with the forecast events
+    db.session.execute(insert(WebhookDelivery.__table__).values(url=subscription.target, payload=payload, attempts=0))
+
+
+def evaluate_subscriptions(init_date, warning_ids):
+    """Record the notifications raised by the given warning rows of init_date, returning the new ones"""
+    if not warning_ids:
+        return []
+
+    lead_day = func.extract("day", DustWarning.forecast_date - DustWarning.init_date).cast(db.Integer)
+
+    matches = select(Subscription.id, DustWarning.gid, DustWarning.init_date, DustWarning.forecast_date, lead_day,
+                     DustWarning.value) \
+        .join(Boundary, Boundary.gid == DustWarning.gid) \
+        .join(Subscription, and_(
+            Subscription.active,
+            or_(Subscription.gid == DustWarning.gid,
+                and_(Subscription.gid.is_(None), Subscription.country_iso == Boundary.country_iso)),
+            DustWarning.value >= Subscription.threshold,
+            or_(Subscription.lead_days.is_(None), Subscription.lead_days.any(lead_day)),
+        )) \
+        .where(DustWarning.init_date == init_date, DustWarning.id.in_(warning_ids))
+
+    table = Notification.__table__
+
+    stmt = insert(table).from_select(
+        ["subscription_id", "gid", "init_date", "forecast_date", "lead_day", "value"], matches
+    ).on_conflict_do_nothing(constraint="unique_notification_forecast") \
+        .returning(table.c.subscription_id, table.c.gid, table.c.forecast_date, table.c.lead_day, table.c.value)
+
+    return db.session.execute(stmt).all()
+
+
+def notify_subscribers(init_date, warning_ids):
+    """Evaluate the subscriptions on the warning rows written for init_date and send the new notifications.
+
+    It returns the number of notifications sent.
+    """
+    notifications = evaluate_subscriptions(init_date, warning_ids)
+
+    if not notifications:
+        return 0
+
+    by_subscription = defaultdict(list)
+    for notification in notifications:
+        by_subscription[notification.subscription_id].append(notification)
+
+    subscriptions = db.session.execute(
+        select(Subscription).where(Subscription.id.in_(by_subscription))
+    ).scalars().all()
+
+    names = dict(db.session.execute(
+        select(Boundary.gid, Boundary.name).where(Boundary.gid.in_({n.gid for n in notifications}))
+    ).all())
+
+    for subscription in subscriptions:
+        sink = NOTIFICATION_SINKS.get(subscription.sink)
+
+        if sink is None:
+            logging.warning(f"[ALERTS]: Unknown sink {subscription.sink} of subscription {subscription.id}")
+            continue
+
+        payload = {
+            "event": ALERT_EVENT,
+            "subscription_id": subscription.id,
+            "subscription": subscription.name,
+            "init_date": init_date.strftime(DATE_FORMAT),
+            "threshold": subscription.threshold,
+            "regions": [
+                {
+                    "gid": n.gid,
+                    "name": names.get(n.gid),
+                    "forecast_date": n.forecast_date.strftime(DATE_FORMAT),
+                    "lead_day": n.lead_day,
+                    "value": n.value,
+                    "level": warning_levels.get(n.value, "Unknown"),
+                }
+                for n in sorted(by_subscription[subscription.id], key=lambda n: (n.forecast_date, n.gid))
+            ],
+        }
+
+        sink(subscription, payload)
+
+    return len(notifications)
@@ -0,0 +1,114 @@
+from flask import Flask, jsonify
+from flask_cors import CORS
+from flask_httpauth import HTTPBasicAuth
+from flask_migrate import Migrate
+from healthcheck import HealthCheck
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.security import check_password_hash
+
+from dustwarning.caching import ttl_cache
+from dustwarning.config import SETTINGS
+from dustwarning.extensions import db, configure_database
+from dustwarning.handlers import configure_logging
+from dustwarning.metrics import metrics_view
+
+logger = configure_logging()
+
+# Flask App
+app = Flask("dustwarning", template_folder=SETTINGS.get("TEMPLATE_DIR"))
+auth = HTTPBasicAuth()
+CORS(app)
+
+# Config
+configure_database(app)
+
+# pagination
+app.config['ITEMS_PER_PAGE'] = SETTINGS.get('ITEMS_PER_PAGE', 20)
+
+# Database
+migrate = Migrate(app, db)
+
+# wrap flask app and give a healthcheck url
+health = HealthCheck(app, "/healthcheck")
+
+
+@ttl_cache(SETTINGS.get("HEALTHCHECK_CACHE_SECONDS", 10))
+def ping_database():
+    """Check out a pooled connection for a bare SELECT 1, the result being shared by the probes for a few seconds"""
+    try:
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+    except SQLAlchemyError as e:
+        return False, str(e)
+
+    return True, "dbworks"
+
+
+def db_available():
+    return ping_database()
+
+
+health.add_check(db_available)
+
+# Prometheus metrics, aggregated over the workers
+app.add_url_rule("/metrics", "metrics", metrics_view)
+
+# DB has to be ready!
+from dustwarning.routes.api.v1 import endpoints, error
+
+
+@auth.verify_password
+def verify_password(username, password):
+    if SETTINGS.get("API_USERNAME") and SETTINGS.get("API_PASSWORD_HASH") and SETTINGS.get("API_USERNAME") == username \
+            and check_password_hash(SETTINGS.get("API_PASSWORD_HASH"), password):
+        return True
+    return False
+
+
+@auth.error_handler
+def auth_error(status):
+    return jsonify(message="Unauthorized"), status
+
+
+# Blueprint Flask Routing
+app.register_blueprint(endpoints, url_prefix='/api/v1')
+
+
+@app.errorhandler(403)
+def forbidden(e):
+    return error(status=403, detail='Forbidden')
+
+
+@app.errorhandler(404)
+def page_not_found(e):
+    return error(status=404, detail='Not Found')
+
+
+@app.errorhandler(405)
+def method_not_allowed(e):
+    return error(status=405, detail='Method Not Allowed')
+
+
+@app.errorhandler(410)
+def gone(e):
+    return error(status=410, detail='Gone')
+
+
+@app.errorhandler(500)
+def internal_server_error(e):
+    return error(status=500, detail='Internal Server Error')
+
+
+from dustwarning import commands
+
+app.cli.add_command(commands.setup_schema)
+app.cli.add_command(commands.load_boundaries)
+app.cli.add_command(commands.load_warnings)
+app.cli.add_command(commands.run_scheduler)
+app.cli.add_command(commands.create_pg_function)
+app.cli.add_command(commands.pregenerate_tiles)
+app.cli.add_command(commands.prune_warnings)
+app.cli.add_command(commands.export_warnings)
+app.cli.add_command(commands.update_skill)
+app.cli.add_command(commands.deliver_webhooks)
+app.cli.add_command(commands.add_subscription)
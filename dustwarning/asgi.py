@@ -0,0 +1,304 @@
+"""ASGI entry point, for traffic spikes on the read API.
+
+    gunicorn -k uvicorn.workers.UvicornWorker dustwarning.asgi:application
+
+The hot read endpoints are served by coroutines on an async engine (asyncpg), so that waiting on Postgres does
+not hold a worker thread. Every other request goes to the Flask app, run in a thread pool. Both paths share the
+statements, payload builders and caches of dustwarning.queries, and keep the JSON contract of the Flask routes.
+The event stream is served here too, each open stream costing a coroutine instead of a worker.
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.http import http_date, is_resource_modified, quote_etag
+
+from dustwarning import app
+from dustwarning.caching import async_ttl_cache
+from dustwarning.config import SETTINGS
+from dustwarning.events import EVENTS_AFTER_STMT, EVENTS_POLL_SECONDS, EVENTS_STREAM_SECONDS, LAST_EVENT_ID_STMT, \
+    format_event, parse_last_event_id
+from dustwarning.extensions import get_engine_options
+from dustwarning.metrics import REQUEST_SECONDS
+from dustwarning.queries import API_CACHE_TTL, COUNTRY_WARNINGS_STMT, LATEST_FORECASTS_STMT, TILE_STMT, \
+    available_dates_cache, build_available_dates, build_country_warnings, build_latest_forecasts, \
+    build_warnings_payload, get_forecasts_version, warnings_cache, warnings_etag
+
+TILE_CACHE_MAX_AGE = SETTINGS.get("TILE_CACHE_MAX_AGE", 3600)
+
+_engine = None
+
+
+def get_async_engine():
+    """Async engine on the configured database, created on first use inside the event loop.
+
+    It takes the pool options of the sync engine. asyncpg also keeps the statements it ran prepared on each
+    pooled connection, so the hot queries are not parsed again by Postgres.
+    """
+    global _engine
+
+    if _engine is None:
+        url = make_url(SETTINGS.get("SQLALCHEMY_DATABASE_URI")).set(drivername="postgresql+asyncpg")
+        _engine = create_async_engine(url, **get_engine_options())
+
+    return _engine
+
+
+async def execute(stmt, params=None):
+    async with get_async_engine().connect() as connection:
+        return (await connection.execute(stmt, params)).all()
+
+
+@async_ttl_cache(API_CACHE_TTL)
+async def get_latest_forecasts():
+    return build_latest_forecasts(await execute(LATEST_FORECASTS_STMT))
+
+
+@async_ttl_cache(EVENTS_POLL_SECONDS)
+async def get_last_event_id():
+    return (await execute(LAST_EVENT_ID_STMT))[0][0]
+
+
+class Response:
+    """Minimal HTTP response, its JSON bodies serialized like Flask's jsonify"""
+
+    def __init__(self, payload=None, status=200, body=None, mimetype="application/json"):
+        if body is None and payload is not None:
+            body = (app.json.dumps(payload, separators=(",", ":")) + "\n").encode()
+
+        self.status = status
+        self.body = body or b""
+        # CORS(app) sends this header on every response of the Flask app
+        self.headers = {"access-control-allow-origin": "*"}
+
+        if self.body:
+            self.headers["content-type"] = mimetype
+
+    def cache(self, max_age, etag=None, last_modified=None):
+        self.headers["cache-control"] = f"public, max-age={max_age}"
+        if etag:
+            self.headers["etag"] = quote_etag(etag)
+        if last_modified:
+            self.headers["last-modified"] = http_date(last_modified)
+
+        return self
+
+    def make_conditional(self, scope, etag=None, last_modified=None):
+        """Turn the response into a 304 when the request validators match, as Flask's make_conditional does"""
+        environ = {"REQUEST_METHOD": scope["method"]}
+
+        for name, value in scope["headers"]:
+            name = name.decode("latin-1").upper().replace("-", "_")
+            if name in ("IF_NONE_MATCH", "IF_MODIFIED_SINCE"):
+                environ[f"HTTP_{name}"] = value.decode("latin-1")
+
+        if self.status == 200 and not is_resource_modified(environ, etag=etag, last_modified=last_modified):
+            self.status = 304
+            self.body = b""
+
+        return self
+
+    async def send(self, scope, send):
+        headers = dict(self.headers)
+
+        if self.status != 304:
+            headers["content-length"] = str(len(self.body))
+
+        await send({
+            "type": "http.response.start",
+            "status": self.status,
+            "headers": [(name.encode(), value.encode()) for name, value in headers.items()],
+        })
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else self.body})
+
+
+def error(status=400, detail='Bad Request'):
+    return Response({'status': status, 'detail': detail}, status=status)
+
+
+async def get_available_dates(scope):
+    latest_forecasts = await get_latest_forecasts()
+    version = get_forecasts_version(latest_forecasts)
+
+    dates = available_dates_cache.get(version)
+
+    if dates is None:
+        dates = build_available_dates(latest_forecasts)
+        available_dates_cache.set(version, dates)
+
+    return Response(dates).cache(API_CACHE_TTL, etag=version).make_conditional(scope, etag=version)
+
+
+async def get_warnings(scope, iso, forecast_date):
+    iso = iso.upper()
+
+    try:
+        forecast_date = datetime.strptime(forecast_date, "%Y-%m-%d")
+    except ValueError:
+        return error(status=400, detail='Invalid forecast date, expected YYYY-MM-DD')
+
+    latest_forecast = (await get_latest_forecasts()).get(iso)
+
+    if not latest_forecast:
+        return error(status=404, detail='Not Found')
+
+    init_date, updated_at = latest_forecast
+
+    key = (iso, init_date, forecast_date, updated_at)
+    warnings = warnings_cache.get(key)
+
+    if warnings is None:
+        params = {"iso": iso, "init_date": init_date, "forecast_date": forecast_date}
+        warnings = build_country_warnings(await execute(COUNTRY_WARNINGS_STMT, params))
+        if warnings:
+            warnings_cache.set(key, warnings)
+
+    if not warnings:
+        return error(status=404, detail='Not Found')
+
+    etag = warnings_etag(iso, init_date, forecast_date, updated_at)
+
+    return Response(build_warnings_payload(iso, init_date, forecast_date, warnings)) \
+        .cache(API_CACHE_TTL, etag=etag, last_modified=updated_at) \
+        .make_conditional(scope, etag=etag, last_modified=updated_at)
+
+
+async def get_tile(scope, iso, forecast_date, z, x, y):
+    try:
+        forecast_date = datetime.strptime(forecast_date, "%Y-%m-%d")
+    except ValueError:
+        return error(status=400, detail='Invalid forecast date, expected YYYY-MM-DD')
+
+    rows = await execute(TILE_STMT, {"iso": iso.upper(), "forecast_date": forecast_date,
+                                     "z": int(z), "x": int(x), "y": int(y)})
+
+    # tiles outside the country are never rendered
+    if not rows:
+        return Response(status=204).cache(TILE_CACHE_MAX_AGE)
+
+    tile, etag = rows[0]
+
+    return Response(body=tile, mimetype="application/vnd.mapbox-vector-tile") \
+        .cache(TILE_CACHE_MAX_AGE, etag=etag) \
+        .make_conditional(scope, etag=etag)
+
+
+async def stream_events(scope, receive, send):
+    """A text/event-stream of the forecast events after the Last-Event-ID, for EVENTS_STREAM_SECONDS.
+
+    Without Last-Event-ID only the events to come are sent, and a comment keeps the connection open between
+    them. The latest event id is polled through a memo shared by every open stream of the process. The stream
+    then ends, or as soon as the client disconnects, and the client reconnects resuming after its last event.
+    """
+    try:
+        headers = dict(scope["headers"])
+        last_event_id = parse_last_event_id(headers.get(b"last-event-id", b"").decode("latin-1"))
+    except ValueError:
+        return await error(status=400, detail='Invalid Last-Event-ID, expected an event id').send(scope, send)
+
+    if last_event_id is None:
+        last_event_id = await get_last_event_id()
+
+    disconnected = asyncio.Event()
+
+    async def wait_for_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+
+    watcher = asyncio.create_task(wait_for_disconnect())
+
+    async def send_message(message, more_body=True):
+        await send({"type": "http.response.body", "body": message.encode(), "more_body": more_body})
+
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no"), (b"access-control-allow-origin", b"*")],
+        })
+
+        if scope["method"] == "HEAD":
+            return await send_message("", more_body=False)
+
+        deadline = time.monotonic() + EVENTS_STREAM_SECONDS
+
+        await send_message(f"retry: {EVENTS_POLL_SECONDS * 1000}\n\n")
+
+        while True:
+            if await get_last_event_id() > last_event_id:
+                for event_id, payload in await execute(EVENTS_AFTER_STMT, {"event_id": last_event_id}):
+                    await send_message(format_event(event_id, payload))
+                    last_event_id = event_id
+            else:
+                await send_message(": keep-alive\n\n")
+
+            if time.monotonic() >= deadline:
+                return await send_message("", more_body=False)
+
+            try:
+                await asyncio.wait_for(disconnected.wait(), EVENTS_POLL_SECONDS)
+                return
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        watcher.cancel()
+
+
+# (pattern, handler, metrics endpoint name of the equivalent Flask route)
+ROUTES = [
+    (re.compile(r"^/api/v1/available-forecast-dates\.json/?$"), get_available_dates, "endpoints.get_available_dates"),
+    (re.compile(r"^/api/v1/warnings/(?P<iso>[^/]+)/(?P<forecast_date>[^/]+)\.json$"), get_warnings,
+     "endpoints.get_warnings"),
+    (re.compile(r"^/api/v1/tiles/(?P<iso>[^/]+)/(?P<forecast_date>[^/]+)/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.pbf$"),
+     get_tile, "endpoints.get_tile"),
+]
+
+wsgi_application = WsgiToAsgi(app)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if _engine is not None:
+                    await _engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+        if scope["path"] == "/api/v1/events":
+            try:
+                return await stream_events(scope, receive, send)
+            except Exception:
+                logging.exception("[ASGI]: Error streaming events")
+                return
+
+        for pattern, handler, endpoint in ROUTES:
+            match = pattern.match(scope["path"])
+
+            if match:
+                start = time.perf_counter()
+
+                try:
+                    response = await handler(scope, **match.groupdict())
+                except Exception:
+                    logging.exception(f"[ASGI]: Error serving {scope['path']}")
+                    response = error(status=500, detail='Internal Server Error')
+
+                await response.send(scope, send)
+
+                REQUEST_SECONDS.labels(endpoint=endpoint, method=scope["method"],
+                                       status=response.status).observe(time.perf_counter() - start)
+                return
+
+    await wsgi_application(scope, receive, send)
@@ -0,0 +1,115 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from dustwarning.metrics import record_cache
+
+
+class LRUCache:
+    """Small thread safe least-recently-used cache, its lookups recorded in the cache metrics under name"""
+
+    def __init__(self, maxsize=128, name=None):
+        self.maxsize = maxsize
+        self.name = name
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            hit = key in self.data
+            if hit:
+                self.data.move_to_end(key)
+                self.hits += 1
+                value = self.data[key]
+            else:
+                self.misses += 1
+                value = default
+
+        if self.name:
+            record_cache(self.name, hit)
+
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def get_or_set(self, key, func):
+        value = self.get(key)
+
+        if value is None:
+            value = func()
+            if value is not None:
+                self.set(key, value)
+
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+def ttl_cache(seconds):
+    """Memoize a function on its positional arguments for a number of seconds"""
+
+    def decorator(func):
+        cache = {}
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            now = time.monotonic()
+
+            with lock:
+                entry = cache.get(args)
+                if entry and entry[0] > now:
+                    return entry[1]
+
+            value = func(*args)
+
+            with lock:
+                cache[args] = (now + seconds, value)
+
+            return value
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+
+        return wrapper
+
+    return decorator
+
+
+def async_ttl_cache(seconds):
+    """ttl_cache for coroutine functions, to be used from a single event loop"""
+
+    def decorator(func):
+        cache = {}
+
+        @functools.wraps(func)
+        async def wrapper(*args):
+            now = time.monotonic()
+
+            entry = cache.get(args)
+            if entry and entry[0] > now:
+                return entry[1]
+
+            value = await func(*args)
+            cache[args] = (now + seconds, value)
+
+            return value
+
+        wrapper.cache_clear = cache.clear
+
+        return wrapper
+
+    return decorator
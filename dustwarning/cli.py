@@ -0,0 +1,64 @@
+"""Ingestion commands without the web app.
+
+    python -m dustwarning.cli load_warnings
+
+Only Flask, SQLAlchemy and the modules a command uses are imported, the engine being created on first use. The
+models still bring GeoAlchemy2, which imports shapely and numpy when they are installed. See bench/importtime.py
+for the import time of the commands.
+"""
+import importlib
+
+import click
+from flask import Flask
+
+from dustwarning.extensions import configure_database
+from dustwarning.handlers import configure_logging
+from dustwarning.metrics import use_command_files
+
+# command name -> module defining it
+COMMANDS = {
+    "load_warnings": "dustwarning.commands",
+    "load_boundaries": "dustwarning.commands",
+    "run_scheduler": "dustwarning.commands",
+    "pregenerate_tiles": "dustwarning.commands",
+    "prune_warnings": "dustwarning.commands",
+    "export_warnings": "dustwarning.commands",
+    "update_forecast_skill": "dustwarning.commands",
+    "deliver_webhooks": "dustwarning.commands",
+    "add_subscription": "dustwarning.commands",
+}
+
+
+def create_cli_app():
+    """A bare app holding the database configuration, without blueprints, CORS or the health check"""
+    app = Flask("dustwarning")
+    configure_database(app)
+
+    return app
+
+
+class LazyGroup(click.Group):
+    def list_commands(self, ctx):
+        return sorted(COMMANDS)
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in COMMANDS:
+            return None
+
+        module = importlib.import_module(COMMANDS[cmd_name])
+
+        return next(command for command in vars(module).values()
+                    if isinstance(command, click.Command) and command.name == cmd_name)
+
+
+@click.group(cls=LazyGroup)
+@click.pass_context
+def cli(ctx):
+    configure_logging()
+    use_command_files(ctx.invoked_subcommand)
+
+    ctx.with_resource(create_cli_app().app_context())
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,18 +1,24 @@
 import json
 import logging
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import timedelta
 
 import click
-import pytz
-from sqlalchemy import func
 from sqlalchemy.sql import text
 
 from dustwarning import db
 from dustwarning.config import SETTINGS
-from .mapping import boundary_config
-from .models import Boundary, DustWarning
-from .utils import read_state, get_next_day, get_json_warnings, update_state
+from .alerts import NOTIFICATION_SINKS
+from .events import deliver_webhooks as deliver_pending_webhooks
+from .mapping import boundary_config, warning_levels
+from .models import Subscription
+from .ingest import ingest_warnings, INCOMPLETE
+from .partitions import prune_warning_partitions
+from .scheduler import run_scheduler as run_ingestion_scheduler
+from .tiles import pregenerate_tiles as render_tiles
+from .helpers import transaction, upsert_boundaries, update_derived_geometries, SIMPLIFIED_GEOMETRIES
+from .utils import iter_geojson_features
 
 BOUNDARY_DATA_DIR = os.path.dirname(os.path.abspath(__file__)) + "/boundary_data"
 COUNTRY_ISO_CODES = SETTINGS.get("COUNTRY_ISO_CODES")
@@ -39,6 +45,10 @@ def setup_schema():
 def create_pg_function():
     logging.info("[DBSETUP]: Creating pg function")
     
+    # pick the simplified geometry matching the zoom, full resolution above the last band
+    zoom_cases = " ".join(f"WHEN z <= {max_zoom} THEN COALESCE(s.{column}, s.geom_3857)"
+                          for column, _, max_zoom in SIMPLIFIED_GEOMETRIES)
+    
     sql = f"""
             CREATE OR REPLACE FUNCTION public.aemet_dust_warnings(
             z integer,
@@ -56,9 +66,10 @@ def create_pg_function():
             initial_date timestamp without time zone;
             f_date ALIAS FOR $5;
         BEGIN
-         -- If initial_date is not provided, determine the latest available, minus 1
-            SELECT MAX(init_date) INTO initial_date
-            FROM aemet.aemet_dust_warning;
+            -- latest init_date loaded for the country, maintained by load_warnings
+            SELECT l.init_date INTO initial_date
+            FROM aemet.aemet_latest_forecast l
+            WHERE l.country_iso = iso;
             
             WITH
             bounds AS (
@@ -67,7 +78,7 @@ def create_pg_function():
             ),
             mvt AS (
                 SELECT 
-                    ST_AsMVTGeom(ST_Transform(s.geom, 3857), bounds.geom) AS geom, 
+                    ST_AsMVTGeom(CASE {zoom_cases} ELSE s.geom_3857 END, bounds.geom) AS geom, 
                     s.name, 
                     o.*,
                     CASE
@@ -78,7 +89,8 @@ def create_pg_function():
                         ELSE 'Unknown'
                     END AS level 
                 FROM aemet.aemet_dust_warning o, bounds, aemet.aemet_country_boundary s
-                WHERE s.country_iso=iso AND o.gid=s.gid AND o.init_date=initial_date AND o.forecast_date=f_date
+                WHERE s.country_iso=iso AND s.geom_3857 && bounds.geom
+                    AND o.gid=s.gid AND o.init_date=initial_date AND o.forecast_date=f_date
             )
             -- Generate MVT encoding of final input record
             SELECT ST_AsMVT(mvt, 'default')
@@ -108,29 +120,30 @@ def load_boundaries():
         logging.info("[BOUNDARY LOADING]: No country ISO codes provided")
         return
     
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    
     for country_code in COUNTRY_ISO_CODES:
         if boundary_config.get(country_code):
             config = boundary_config.get(country_code)
             
             iso = config.get("iso")
             
-            logging.info("[BOUNDARY LOADING]: Loading boundaries for {}".format(country_code))
-            
             geojson_file = os.path.join(BOUNDARY_DATA_DIR, f"{iso.lower()}.geojson")
             
             if not os.path.exists(geojson_file):
                 logging.info(f"[BOUNDARY LOADING]: File {geojson_file} does not exist")
                 continue
             
-            logging.info(f"[BOUNDARY LOADING]: Loading {geojson_file}")
+            start = time.perf_counter()
             
             id_field = config.get("id_field")
             name_field = config.get("name_field")
             
-            with open(geojson_file, "r") as f:
-                geojson = json.load(f)
-                
-                features = geojson.get("features")
+            boundaries_data = {}
+            skipped = 0
+            
+            with open(geojson_file, "rb") as f:
+                features = iter_geojson_features(f)
                 
                 for feature in features:
                     props = feature.get("properties")
@@ -139,7 +152,7 @@ def load_boundaries():
                     name = props.get(name_field)
                     
                     if id_prop is None and name is None:
-                        logging.info(f"[BOUNDARY]: Skipping ")
+                        skipped += 1
                         continue
                     
                     gid = f"{iso}_{id_prop}"
@@ -154,147 +167,146 @@ def load_boundaries():
                             "coordinates": [geom.get("coordinates")]
                         }
                     
-                    boundary_data = {
+                    boundaries_data[gid] = {
                         "gid": gid,
                         "country_iso": iso,
                         "name": name,
-                        "geom": func.ST_GeomFromGeoJSON(json.dumps(geom))
+                        "geojson": json.dumps(geom)
                     }
                     
-                    db_boundary = Boundary.query.get(boundary_data.get("gid"))
-                    exists = False
-                    
-                    if db_boundary:
-                        exists = True
-                    
-                    db_boundary = Boundary(**boundary_data)
-                    
-                    if exists:
-                        logging.info('[BOUNDARY]: UPDATE')
-                        db.session.merge(db_boundary)
-                    else:
-                        logging.info('[BOUNDARY]: ADD')
-                        db.session.add(db_boundary)
-                    
-                    db.session.commit()
+                    if debug:
+                        logging.debug(f"[BOUNDARY LOADING]: {gid} {name}")
+            
+            # one transaction per country file, derived geometries included
+            with transaction("load_boundaries"):
+                rows_count = upsert_boundaries(list(boundaries_data.values()))
+                update_derived_geometries(iso)
+            
+            logging.info(f"[BOUNDARY LOADING]: Upserted {rows_count} boundaries for {iso}, skipped {skipped}",
+                         extra={"country_iso": iso, "rows": rows_count, "skipped": skipped,
+                                "bytes": os.path.getsize(geojson_file),
+                                "seconds": round(time.perf_counter() - start, 3)})
 
 
 @click.command(name="load_warnings")
 def load_warnings():
-    if not COUNTRY_ISO_CODES:
-        logging.info("[WARNING LOADING]: No country ISO codes provided")
-        return None
+    result = ingest_warnings()
     
-    state = read_state()
+    return False if result == INCOMPLETE else None
+
+
+@click.command(name="run_scheduler")
+def run_scheduler():
+    logging.info("[SCHEDULER]: Starting warnings scheduler")
     
-    day_vals = ["0", "1", "2"]
+    run_ingestion_scheduler()
+
+
+@click.command(name="deliver_webhooks")
+@click.option("--limit", type=int, default=100, help="Most deliveries attempted in this run")
+def deliver_webhooks(limit):
+    delivered, failed = deliver_pending_webhooks(limit=limit)
     
-    last_update = state.get("last_update")
+    return False if failed else None
+
+
+@click.command(name="add_subscription")
+@click.option("--name", required=True, help="Subscriber name, shown in the notifications")
+@click.option("--iso", "country_iso", default=None, help="Country ISO code, to alert on all its regions")
+@click.option("--gid", default=None, help="Region gid, to alert on a single region")
+@click.option("--threshold", type=click.Choice([str(value) for value in warning_levels]), required=True,
+              help="Lowest warning value alerted on")
+@click.option("--lead", "lead_days", type=click.IntRange(0, 2), multiple=True, help="Lead day, all when omitted")
+@click.option("--sink", type=click.Choice(sorted(NOTIFICATION_SINKS)), default="log", help="Notification sink")
+@click.option("--target", default=None, help="Url posted the notifications by the webhook sink")
+def add_subscription(name, country_iso, gid, threshold, lead_days, sink, target):
+    if not country_iso and not gid:
+        raise click.UsageError("Expected --iso or --gid")
     
-    if last_update:
-        next_update = get_next_day(last_update)
-    else:
-        next_update = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    if sink == "webhook" and not target:
+        raise click.UsageError("The webhook sink needs a --target url")
     
-    target_timezone = pytz.timezone('Europe/Paris')
-    current_time_utc_plus_one = datetime.now(target_timezone)
+    subscription = Subscription(name, int(threshold), country_iso=country_iso.upper() if country_iso else None,
+                                gid=gid, lead_days=sorted(set(lead_days)) or None, sink=sink, target=target)
     
-    # only run after 12:05 UTC+1
-    # This is the time when the AEMET data is likely to have been updated
-    if current_time_utc_plus_one < current_time_utc_plus_one.replace(hour=12, minute=5):
-        logging.warning(f"[WARNINGS]: Skipping warnings update as it is before 12:05 UTC+1. "
-                        f"Current time is {current_time_utc_plus_one}")
-        return None
+    with transaction("add_subscription"):
+        db.session.add(subscription)
     
-    if next_update:
-        next_update_str = next_update.strftime("%Y%m%d")
-        next_update_str_iso = next_update.isoformat()
-        
-        for country_code in COUNTRY_ISO_CODES:
-            if boundary_config.get(country_code):
-                config = boundary_config.get(country_code)
-                country_iso = config.get("iso")
-                
-                logging.info("[WARNING LOADING]: Loading warnings for {}".format(country_code))
-                
-                id_field = config.get("id_field")
-                name_field = config.get("name_field")
-                
-                geojson_url_template = config.get("geojson_url_template")
-                
-                warnings_data = {}
-                
-                for day_val in day_vals:
-                    forecast_date = next_update + timedelta(days=int(day_val))
-                    
-                    geojson_url = geojson_url_template.format(date_str=next_update_str, day_val=day_val)
-                    
-                    logging.info(f"[WARNINGS]: Fetching warnings for date {next_update_str} and day {day_val}")
-                    
-                    try:
-                        geojson_warnings = get_json_warnings(geojson_url)
-                        
-                        if not geojson_warnings:
-                            logging.warning(f"[WARNINGS]: No warnings found for {geojson_url}")
-                            return False
-                        
-                        if geojson_warnings:
-                            features = geojson_warnings.get("features")
-                            
-                            if not features:
-                                logging.warning(f"[WARNINGS]: No features found for {geojson_url}")
-                                return False
-                            
-                            for feature in features:
-                                props = feature.get("properties")
-                                
-                                id_prop = props.get(id_field)
-                                name = props.get(name_field)
-                                
-                                if id_prop is None and name is None:
-                                    logging.info(f"[WARNINGS]: Skipping ")
-                                    return False
-                                
-                                gid = f"{country_iso}_{id_prop}"
-                                value = props["value"]
-                                
-                                d_data = {
-                                    "gid": gid,
-                                    "init_date": next_update,
-                                    "forecast_date": forecast_date,
-                                    "value": value
-                                }
-                                
-                                if not warnings_data.get(gid):
-                                    warnings_data[gid] = [d_data]
-                                else:
-                                    warnings_data[gid].append(d_data)
-                    
-                    except Exception as e:
-                        logging.info(f"[WARNINGS]: {e}")
-                        return False
-                
-                for gid, warning_items in warnings_data.items():
-                    for warning_data in warning_items:
-                        exists = False
-                        db_warning = DustWarning.query.filter_by(init_date=warning_data.get("init_date"),
-                                                                 forecast_date=warning_data.get("forecast_date"),
-                                                                 gid=gid).first()
-                        if db_warning:
-                            exists = True
-                        else:
-                            db_warning = DustWarning(**warning_data)
-                        
-                        if exists:
-                            logging.info('[WARNING]: UPDATE')
-                            db_warning.value = warning_data["value"]
-                        else:
-                            logging.info('[WARNING]: ADD')
-                            db.session.add(db_warning)
-                        db.session.commit()
+    logging.info(f"[ALERTS]: Added subscription {subscription.id} for {name}")
+
+
+@click.command(name="pregenerate_tiles")
+@click.option("--iso", "country_isos", multiple=True, help="Country ISO code, all countries when omitted")
+def pregenerate_tiles(country_isos):
+    logging.info("[TILES]: Pre-rendering tiles")
+    
+    render_tiles(list(country_isos) or None)
+    
+    logging.info("[TILES]: Done pre-rendering tiles")
+
+
+@click.command(name="update_forecast_skill")
+@click.option("--iso", "country_isos", multiple=True, help="Country ISO code, all countries when omitted")
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="First forecast date to compute, the oldest init date when omitted")
+@click.option("--end", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="Last forecast date to compute, the latest init date when omitted")
+def update_skill(country_isos, start, end):
+    from .skill import update_forecast_skill
+    
+    country_isos = list(country_isos) or [config.get("iso") for config in boundary_config.values()]
+    
+    if not start or not end:
+        first, last = db.session.execute(text("SELECT min(init_date), max(init_date) FROM aemet_dust_warning")).one()
         
-        update_state(next_update_str_iso)
+        if first is None:
+            logging.info("[SKILL]: No warnings loaded, nothing to compute")
+            return
         
-        logging.info(f"[WARNINGS]: Done fetching warnings for date {next_update_str}")
-        return None
-    return None
+        start = start or first
+        end = end or last
+    
+    logging.info(f"[SKILL]: Computing forecast skill from {start.date()} to {end.date()}")
+    
+    forecast_date = start
+    
+    while forecast_date <= end:
+        with transaction("update_forecast_skill"):
+            update_forecast_skill(forecast_date, country_isos)
+        forecast_date += timedelta(days=1)
+    
+    logging.info("[SKILL]: Done computing forecast skill")
+
+
+@click.command(name="prune_warnings")
+@click.option("--keep-months", type=int, default=SETTINGS.get("WARNING_RETENTION_MONTHS"),
+              help="Number of months of warnings to keep, 0 keeps everything")
+@click.option("--drop/--detach", default=SETTINGS.get("WARNING_RETENTION_DROP"),
+              help="Drop old partitions instead of detaching them")
+def prune_warnings(keep_months, drop):
+    if not keep_months:
+        logging.info("[RETENTION]: No retention configured, keeping all warnings")
+        return
+    
+    logging.info(f"[RETENTION]: Keeping the last {keep_months} months of warnings")
+    
+    with transaction("prune_warnings"):
+        pruned = prune_warning_partitions(keep_months, drop=drop)
+    
+    logging.info(f"[RETENTION]: Done, {len(pruned)} partitions pruned")
+
+
+@click.command(name="export_warnings")
+@click.option("--iso", "country_isos", multiple=True, help="Country ISO code, all countries when omitted")
+@click.option("--output-dir", default=None, help="Export directory, EXPORT_DIR when omitted")
+def export_warnings(country_isos, output_dir):
+    # pyarrow is only loaded by the commands that need it
+    from .export import EXPORT_DIR, export_warnings as export_history
+    
+    output_dir = output_dir or EXPORT_DIR
+    
+    logging.info(f"[EXPORT]: Exporting warnings to {output_dir}")
+    
+    export_history(list(country_isos) or None, output_dir=output_dir)
+    
+    logging.info("[EXPORT]: Done exporting warnings")
@@ -8,6 +8,11 @@ COUNTRY_ISO_CODES = os.getenv('COUNTRY_ISO_CODES')
 if COUNTRY_ISO_CODES:
     COUNTRY_ISO_CODES = COUNTRY_ISO_CODES.split(',')
 
+WEBHOOK_URLS = os.getenv('WEBHOOK_URLS')
+
+if WEBHOOK_URLS:
+    WEBHOOK_URLS = WEBHOOK_URLS.split(',')
+
 SETTINGS = {
     'logging': {
         'level': log_level
@@ -18,6 +23,13 @@ SETTINGS = {
     'SQLALCHEMY_DATABASE_URI': os.getenv('SQLALCHEMY_DATABASE_URI'),
     'STATE_DIR': os.getenv('STATE_DIR'),
     'BOUNDARY_DATA_DIR': os.getenv('BOUNDARY_DATA_DIR'),
+    'DB_POOL_SIZE': int(os.getenv('DB_POOL_SIZE', 5)),
+    'DB_MAX_OVERFLOW': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+    'DB_POOL_TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+    'DB_POOL_RECYCLE': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    'DB_POOL_PRE_PING': os.getenv('DB_POOL_PRE_PING', 'True') == 'True',
+    'DB_QUERY_CACHE_SIZE': int(os.getenv('DB_QUERY_CACHE_SIZE', 500)),
+    'HEALTHCHECK_CACHE_SECONDS': int(os.getenv('HEALTHCHECK_CACHE_SECONDS', 10)),
     'ITEMS_PER_PAGE': int(os.getenv('ITEMS_PER_PAGE', 20)),
     'UPLOAD_FOLDER': '/tmp/datasets',
     'ROLLBAR_SERVER_TOKEN': os.getenv('ROLLBAR_SERVER_TOKEN'),
@@ -28,4 +40,29 @@ SETTINGS = {
     'API_PASSWORD_HASH': os.getenv('API_PASSWORD_HASH'),
     'COUNTRY_ISO_CODES': COUNTRY_ISO_CODES,
     'VERIFY_SSL': os.getenv('VERIFY_SSL', 'True') == 'True',
+    'FETCH_CONCURRENCY': int(os.getenv('FETCH_CONCURRENCY', 8)),
+    'FETCH_TIMEOUT': int(os.getenv('FETCH_TIMEOUT', 30)),
+    'RESPONSE_CACHE_MAX_AGE_DAYS': int(os.getenv('RESPONSE_CACHE_MAX_AGE_DAYS', 7)),
+    'RESPONSE_CACHE_MAX_SIZE_MB': int(os.getenv('RESPONSE_CACHE_MAX_SIZE_MB', 100)),
+    'TILE_CACHE_MIN_ZOOM': int(os.getenv('TILE_CACHE_MIN_ZOOM', 0)),
+    'TILE_CACHE_MAX_ZOOM': int(os.getenv('TILE_CACHE_MAX_ZOOM', 8)),
+    'TILE_CACHE_MAX_AGE': int(os.getenv('TILE_CACHE_MAX_AGE', 3600)),
+    'EXPORT_DIR': os.getenv('EXPORT_DIR'),
+    'WARNING_RETENTION_MONTHS': int(os.getenv('WARNING_RETENTION_MONTHS', 0)),
+    'WARNING_RETENTION_DROP': os.getenv('WARNING_RETENTION_DROP', 'False') == 'True',
+    'SCHEDULER_RETRY_MIN_DELAY': int(os.getenv('SCHEDULER_RETRY_MIN_DELAY', 60)),
+    'SCHEDULER_RETRY_MAX_DELAY': int(os.getenv('SCHEDULER_RETRY_MAX_DELAY', 1800)),
+    'SCHEDULER_METRICS_PORT': int(os.getenv('SCHEDULER_METRICS_PORT', 0)),
+    'SKILL_THRESHOLD': int(os.getenv('SKILL_THRESHOLD', 1)),
+    'API_CACHE_TTL': int(os.getenv('API_CACHE_TTL', 60)),
+    'API_CACHE_SIZE': int(os.getenv('API_CACHE_SIZE', 256)),
+    'EVENTS_POLL_SECONDS': int(os.getenv('EVENTS_POLL_SECONDS', 5)),
+    'EVENTS_STREAM_SECONDS': int(os.getenv('EVENTS_STREAM_SECONDS', 300)),
+    'WEBHOOK_URLS': WEBHOOK_URLS,
+    'WEBHOOK_SECRET': os.getenv('WEBHOOK_SECRET'),
+    'WEBHOOK_TIMEOUT': int(os.getenv('WEBHOOK_TIMEOUT', 10)),
+    'WEBHOOK_MAX_ATTEMPTS': int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 10)),
+    'WEBHOOK_RETRY_MIN_DELAY': int(os.getenv('WEBHOOK_RETRY_MIN_DELAY', 60)),
+    'WEBHOOK_RETRY_MAX_DELAY': int(os.getenv('WEBHOOK_RETRY_MAX_DELAY', 3600)),
+    'WEBHOOK_DELIVERY_INTERVAL': int(os.getenv('WEBHOOK_DELIVERY_INTERVAL', 60)),
 }
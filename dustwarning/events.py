@@ -0,0 +1,286 @@
+"""Forecast events, pushed to the /api/v1/events stream and to the configured webhooks.
+
+load_warnings records an event in its transaction when it commits a new init_date for some countries, along with
+one pending delivery per webhook url. Other deliveries, such as the alert notifications, are queued with a payload
+of their own. deliver_webhooks posts the due deliveries and retries the failed ones with backoff, so that a slow or
+unreachable receiver never holds up a load.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+from datetime import timedelta
+
+import requests
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from dustwarning import db
+from dustwarning.caching import ttl_cache
+from dustwarning.config import SETTINGS
+from dustwarning.helpers import transaction
+from dustwarning.metrics import WEBHOOK_DELIVERIES
+from dustwarning.models import Boundary, ForecastEvent, LatestForecast, WarningChange, WebhookDelivery
+from dustwarning.queries import DATE_FORMAT
+from dustwarning.utils import retry_delay
+
+EVENTS_POLL_SECONDS = SETTINGS.get("EVENTS_POLL_SECONDS", 5)
+EVENTS_STREAM_SECONDS = SETTINGS.get("EVENTS_STREAM_SECONDS", 300)
+WEBHOOK_URLS = SETTINGS.get("WEBHOOK_URLS") or []
+WEBHOOK_SECRET = SETTINGS.get("WEBHOOK_SECRET")
+WEBHOOK_TIMEOUT = SETTINGS.get("WEBHOOK_TIMEOUT", 10)
+WEBHOOK_MAX_ATTEMPTS = SETTINGS.get("WEBHOOK_MAX_ATTEMPTS", 10)
+WEBHOOK_RETRY_MIN_DELAY = SETTINGS.get("WEBHOOK_RETRY_MIN_DELAY", 60)
+WEBHOOK_RETRY_MAX_DELAY = SETTINGS.get("WEBHOOK_RETRY_MAX_DELAY", 3600)
+VERIFY_SSL = SETTINGS.get("VERIFY_SSL", True)
+
+EVENT_NAME = "forecast"
+# most events sent to a stream at once, a client far behind gets the rest on the next poll
+EVENTS_BATCH_SIZE = 100
+
+# statements of the event stream
+LAST_EVENT_ID_STMT = select(func.coalesce(func.max(ForecastEvent.id), 0))
+
+EVENTS_AFTER_STMT = select(ForecastEvent.id, ForecastEvent.payload) \
+    .where(ForecastEvent.id > bindparam("event_id")) \
+    .order_by(ForecastEvent.id) \
+    .limit(EVENTS_BATCH_SIZE)
+
+
+def get_new_countries(init_date, country_isos):
+    """The countries for which init_date is newer than their latest loaded forecast.
+
+    Must be called before the latest forecasts are moved to init_date.
+    """
+    latest = dict(db.session.execute(
+        select(LatestForecast.country_iso, LatestForecast.init_date)
+        .where(LatestForecast.country_iso.in_(country_isos))
+    ).all())
+
+    return [country_iso for country_iso in country_isos
+            if country_iso not in latest or latest[country_iso] < init_date]
+
+
+def record_forecast_event(init_date, country_isos):
+    """Record the event of init_date being loaded for country_isos and queue its webhook deliveries.
+
+    The event carries, per country, the regions of the init_date change set. It returns the event id.
+    """
+    if not country_isos:
+        return None
+
+    changed = db.session.execute(
+        select(Boundary.country_iso, WarningChange.gid).distinct()
+        .join(Boundary, Boundary.gid == WarningChange.gid)
+        .where(WarningChange.init_date == init_date, Boundary.country_iso.in_(country_isos))
+        .order_by(Boundary.country_iso, WarningChange.gid)
+    ).all()
+
+    regions = {country_iso: [] for country_iso in country_isos}
+    for country_iso, gid in changed:
+        regions[country_iso].append(gid)
+
+    payload = {
+        "event": EVENT_NAME,
+        "init_date": init_date.strftime(DATE_FORMAT),
+        "countries": [{"country_iso": country_iso, "changed_regions": gids}
+                      for country_iso, gids in sorted(regions.items())],
+    }
+
+    stmt = insert(ForecastEvent.__table__).values(init_date=init_date, payload=payload) \
+        .returning(ForecastEvent.__table__.c.id)
+    event_id = db.session.execute(stmt).scalar_one()
+
+    if WEBHOOK_URLS:
+        db.session.execute(insert(WebhookDelivery.__table__),
+                           [{"event_id": event_id, "url": url, "attempts": 0} for url in WEBHOOK_URLS])
+
+    logging.info(f"[EVENTS]: Recorded event {event_id} for date {init_date:%Y%m%d} and {len(country_isos)} "
+                 f"countries, {len(WEBHOOK_URLS)} webhook deliveries queued")
+
+    return event_id
+
+
+def format_event(event_id, payload):
+    """An event as a text/event-stream message"""
+    data = json.dumps({"id": event_id, **payload}, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {EVENT_NAME}\ndata: {data}\n\n"
+
+
+@ttl_cache(EVENTS_POLL_SECONDS)
+def get_last_event_id():
+    """Id of the latest event, queried at most once per poll interval however many streams are open"""
+    # a connection of its own, so that an open stream does not keep one checked out between polls
+    with db.engine.connect() as connection:
+        return connection.execute(LAST_EVENT_ID_STMT).scalar_one()
+
+
+def get_events_after(event_id):
+    with db.engine.connect() as connection:
+        return connection.execute(EVENTS_AFTER_STMT, {"event_id": event_id}).all()
+
+
+def stream_events(last_event_id=None):
+    """The text/event-stream of the Flask app, the messages of the events after last_event_id for
+    EVENTS_STREAM_SECONDS.
+
+    It follows the stream of dustwarning.asgi, but holds a sync worker for its whole life, so that it should only
+    be served by threaded workers and end before the worker timeout.
+    """
+    if last_event_id is None:
+        last_event_id = get_last_event_id()
+
+    deadline = time.monotonic() + EVENTS_STREAM_SECONDS
+
+    yield f"retry: {EVENTS_POLL_SECONDS * 1000}\n\n"
+
+    while True:
+        if get_last_event_id() > last_event_id:
+            for event_id, payload in get_events_after(last_event_id):
+                yield format_event(event_id, payload)
+                last_event_id = event_id
+        else:
+            yield ": keep-alive\n\n"
+
+        if time.monotonic() >= deadline:
+            return
+
+        time.sleep(EVENTS_POLL_SECONDS)
+
+
+def parse_last_event_id(value):
+    """The id a stream resumes after, from the Last-Event-ID header. Raises ValueError when it is malformed"""
+    if not value:
+        return None
+    event_id = int(value)
+    if event_id < 0:
+        raise ValueError("Invalid event id")
+    return event_id
+
+
+def sign_body(body):
+    return "sha256=" + hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def post_payload(session, delivery_id, url, event_id, payload):
+    if event_id is not None:
+        payload = {"id": event_id, **payload}
+
+    body = json.dumps(payload, separators=(",", ":")).encode()
+
+    headers = {
+        "Content-Type": "application/json",
+        "X-Dustwarning-Event": payload.get("event", EVENT_NAME),
+        "X-Dustwarning-Delivery": str(delivery_id),
+    }
+
+    if WEBHOOK_SECRET:
+        headers["X-Dustwarning-Signature"] = sign_body(body)
+
+    response = session.post(url, data=body, headers=headers, timeout=WEBHOOK_TIMEOUT, verify=VERIFY_SSL)
+    response.raise_for_status()
+
+
+def claim_deliveries(limit=100):
+    """Lease the due webhook deliveries, oldest first, returning them.
+
+    Their next attempt is pushed past the time it takes to post them all, so that concurrent runs skip them and
+    a run that dies midway leaves them to be retried once the lease expires.
+    """
+    with transaction("claim_webhooks"):
+        due = db.session.execute(
+            select(WebhookDelivery.id, WebhookDelivery.url, WebhookDelivery.attempts, WebhookDelivery.event_id,
+                   func.coalesce(WebhookDelivery.payload, ForecastEvent.payload))
+            .outerjoin(ForecastEvent, ForecastEvent.id == WebhookDelivery.event_id)
+            .where(WebhookDelivery.delivered_at.is_(None),
+                   WebhookDelivery.next_attempt_at <= func.now(),
+                   WebhookDelivery.attempts < WEBHOOK_MAX_ATTEMPTS)
+            .order_by(WebhookDelivery.next_attempt_at)
+            .limit(limit)
+            .with_for_update(of=WebhookDelivery, skip_locked=True)
+        ).all()
+
+        if due:
+            # the connect and read timeouts of each post, with a margin
+            lease = timedelta(seconds=2 * WEBHOOK_TIMEOUT * len(due) + 60)
+
+            table = WebhookDelivery.__table__
+            db.session.execute(update(table).where(table.c.id.in_([delivery[0] for delivery in due]))
+                               .values(next_attempt_at=func.now() + lease))
+
+    return due
+
+
+def post_deliveries(deliveries):
+    """Post the deliveries, returning the ids of the delivered ones and the outcome rows of the failed ones"""
+    delivered = []
+    failed = []
+
+    with requests.Session() as session:
+        for delivery_id, url, attempts, event_id, payload in deliveries:
+            try:
+                post_payload(session, delivery_id, url, event_id, payload)
+            except requests.RequestException as e:
+                attempts += 1
+
+                if attempts < WEBHOOK_MAX_ATTEMPTS:
+                    logging.warning(f"[WEBHOOKS]: Delivery {delivery_id} to {url} failed, attempt {attempts}: {e}")
+                else:
+                    logging.error(f"[WEBHOOKS]: Giving up delivery {delivery_id} to {url} after {attempts} "
+                                  f"attempts: {e}")
+
+                failed.append({
+                    "delivery_id": delivery_id,
+                    "failed_attempts": attempts,
+                    "delay": timedelta(seconds=retry_delay(attempts - 1, WEBHOOK_RETRY_MIN_DELAY,
+                                                           WEBHOOK_RETRY_MAX_DELAY)),
+                    "error": str(e)[:1000],
+                })
+            else:
+                delivered.append(delivery_id)
+
+    return delivered, failed
+
+
+def record_deliveries(delivered, failed):
+    table = WebhookDelivery.__table__
+
+    with transaction("record_webhooks"):
+        if delivered:
+            db.session.execute(update(table).where(table.c.id.in_(delivered))
+                               .values(attempts=table.c.attempts + 1, delivered_at=func.now(), last_error=None))
+
+        if failed:
+            db.session.execute(
+                update(table).where(table.c.id == bindparam("delivery_id")).values(
+                    attempts=bindparam("failed_attempts"),
+                    next_attempt_at=func.now() + bindparam("delay", type_=db.Interval),
+                    last_error=bindparam("error"),
+                ),
+                failed
+            )
+
+
+def deliver_webhooks(limit=100):
+    """Post the due webhook deliveries, returning the number delivered and failed.
+
+    The deliveries are claimed and their outcomes recorded in two short transactions, none being open while
+    posting. A failed delivery is retried with backoff until it has been attempted WEBHOOK_MAX_ATTEMPTS times.
+    Receivers may see a delivery twice when a run dies after posting it, and can tell by X-Dustwarning-Delivery.
+    """
+    due = claim_deliveries(limit)
+
+    if not due:
+        return 0, 0
+
+    delivered, failed = post_deliveries(due)
+
+    record_deliveries(delivered, failed)
+
+    WEBHOOK_DELIVERIES.labels(outcome="delivered").inc(len(delivered))
+    WEBHOOK_DELIVERIES.labels(outcome="failed").inc(len(failed))
+
+    logging.info(f"[WEBHOOKS]: {len(delivered)} deliveries done, {len(failed)} failed")
+
+    return len(delivered), len(failed)
@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+
+from dustwarning import db
+from dustwarning.config import SETTINGS
+from dustwarning.models import Boundary, DustWarning
+from dustwarning.utils import atomic_write
+
+EXPORT_DIR = SETTINGS.get("EXPORT_DIR") or os.path.join(SETTINGS.get("STATE_DIR"), "export")
+EXPORT_BATCH_SIZE = 50000
+
+# Parquet schema of the exported history: dictionary encoded region ids and one byte values
+WARNINGS_SCHEMA = pa.schema([
+    ("gid", pa.dictionary(pa.int32(), pa.string())),
+    ("init_date", pa.date32()),
+    ("forecast_date", pa.date32()),
+    ("value", pa.int8()),
+])
+
+
+def read_export_manifest(output_dir):
+    """Last init_date exported per country, as {iso: isoformat}"""
+    manifest_file = os.path.join(output_dir, "manifest.json")
+
+    if not os.path.isfile(manifest_file):
+        return {}
+
+    with open(manifest_file, "r") as f:
+        return json.load(f)
+
+
+def write_export_manifest(output_dir, manifest):
+    atomic_write(json.dumps(manifest, indent=4), os.path.join(output_dir, "manifest.json"))
+
+
+def rows_to_table(rows):
+    gids, init_dates, forecast_dates, values = zip(*rows)
+
+    return pa.Table.from_arrays([
+        pa.array(gids, pa.string()).dictionary_encode(),
+        pa.array([d.date() for d in init_dates], pa.date32()),
+        pa.array([d.date() for d in forecast_dates], pa.date32()),
+        pa.array(values, pa.int8()),
+    ], schema=WARNINGS_SCHEMA)
+
+
+class YearPartitionWriter:
+    """Writes the batches of one country into a new part file per year, under iso=XXX/year=YYYY/"""
+
+    def __init__(self, output_dir, country_iso):
+        self.output_dir = output_dir
+        self.country_iso = country_iso
+        self.year = None
+        self.writer = None
+        self.path = None
+        self.rows = 0
+
+    def write(self, rows):
+        # batches are ordered by init_date, so a year is complete as soon as the next one starts
+        for year in sorted({row[1].year for row in rows}):
+            year_rows = [row for row in rows if row[1].year == year]
+
+            if year != self.year:
+                self.close()
+                self.open(year, year_rows[0][1])
+
+            self.writer.write_table(rows_to_table(year_rows))
+            self.rows += len(year_rows)
+
+    def open(self, year, first_init_date):
+        directory = os.path.join(self.output_dir, f"iso={self.country_iso}", f"year={year}")
+        os.makedirs(directory, exist_ok=True)
+
+        # each run appends a new part file starting at the first init_date it exports
+        self.path = os.path.join(directory, f"part-{first_init_date:%Y%m%d}.parquet")
+        self.year = year
+        self.writer = pq.ParquetWriter(f"{self.path}.tmp", WARNINGS_SCHEMA, compression="zstd")
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            os.replace(f"{self.path}.tmp", self.path)
+            self.writer = None
+
+
+def export_country_warnings(country_iso, output_dir, since=None):
+    """Stream the warnings of a country newer than since into yearly Parquet files.
+
+    Returns the last exported init_date, or None when there was nothing new.
+    """
+    stmt = select(DustWarning.gid, DustWarning.init_date, DustWarning.forecast_date, DustWarning.value) \
+        .join(Boundary, Boundary.gid == DustWarning.gid) \
+        .where(Boundary.country_iso == country_iso) \
+        .order_by(DustWarning.init_date, DustWarning.forecast_date, DustWarning.gid)
+
+    if since:
+        stmt = stmt.where(DustWarning.init_date > since)
+
+    # server side cursor, only one batch is held in memory at a time
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+    writer = YearPartitionWriter(output_dir, country_iso)
+    last_init_date = None
+
+    try:
+        for rows in result.partitions():
+            writer.write(rows)
+            last_init_date = rows[-1][1]
+    finally:
+        writer.close()
+
+    logging.info(f"[EXPORT]: Exported {writer.rows} warnings for {country_iso}")
+
+    return last_init_date
+
+
+def export_warnings(country_isos=None, output_dir=EXPORT_DIR):
+    """Incrementally export the warnings history, only init dates newer than the previous export are written"""
+    os.makedirs(output_dir, exist_ok=True)
+
+    if not country_isos:
+        country_isos = db.session.execute(select(Boundary.country_iso).distinct()).scalars().all()
+
+    manifest = read_export_manifest(output_dir)
+
+    for country_iso in country_isos:
+        since = manifest.get(country_iso)
+        last_init_date = export_country_warnings(country_iso, output_dir,
+                                                 since=datetime.fromisoformat(since) if since else None)
+
+        if last_init_date:
+            manifest[country_iso] = last_init_date.isoformat()
+            write_export_manifest(output_dir, manifest)
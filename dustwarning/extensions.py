@@ -0,0 +1,26 @@
+from flask_sqlalchemy import SQLAlchemy
+
+from dustwarning.config import SETTINGS
+
+# bound to an app by init_app, so that models and queries can be imported without building the web app
+db = SQLAlchemy()
+
+
+def get_engine_options():
+    return {
+        "pool_size": SETTINGS.get("DB_POOL_SIZE"),
+        "max_overflow": SETTINGS.get("DB_MAX_OVERFLOW"),
+        "pool_timeout": SETTINGS.get("DB_POOL_TIMEOUT"),
+        "pool_recycle": SETTINGS.get("DB_POOL_RECYCLE"),
+        "pool_pre_ping": SETTINGS.get("DB_POOL_PRE_PING"),
+        # size of the engine's cache of compiled statements
+        "query_cache_size": SETTINGS.get("DB_QUERY_CACHE_SIZE"),
+    }
+
+
+def configure_database(app):
+    app.config['SQLALCHEMY_DATABASE_URI'] = SETTINGS.get('SQLALCHEMY_DATABASE_URI')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options()
+
+    db.init_app(app)
@@ -1 +1,72 @@
+import atexit
 import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from dustwarning.config import SETTINGS
+
+_listener = None
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class PackageFilter(logging.Filter):
+    """Pass the records of the dustwarning loggers and those logged by its modules on the root logger only, so that
+    the logs of werkzeug, sqlalchemy or urllib3 are not shipped"""
+
+    def filter(self, record):
+        return (record.name == "dustwarning" or record.name.startswith("dustwarning.")
+                or record.pathname.startswith(PACKAGE_DIR + os.sep))
+
+
+def configure_logging():
+    """Configure the root logger and log unhandled exceptions.
+
+    Records are shipped to Graylog, when configured, from a background thread fed by a queue, so that a slow
+    network never blocks the ingestion loop or the request threads. The extra fields of a record are sent as
+    GELF additional fields.
+    """
+    global _listener
+
+    logging.basicConfig(
+        level=SETTINGS.get('logging', {}).get('level'),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y%m%d-%H:%M%p',
+    )
+
+    # Ensure all unhandled exceptions are logged
+    logger = logging.getLogger("dustwarning")
+
+    if _listener is not None or logger.handlers:
+        return logger
+
+    logger.setLevel(SETTINGS.get('logging', {}).get('level'))
+    logger.addHandler(logging.StreamHandler(stream=sys.stdout))
+
+    if SETTINGS.get("GRAYLOG_HOST") and SETTINGS.get("GRAYLOG_PORT"):
+        import graypy
+
+        gelf_handler = graypy.GELFUDPHandler(SETTINGS.get("GRAYLOG_HOST"), int(SETTINGS.get("GRAYLOG_PORT")))
+        log_queue = queue.SimpleQueue()
+
+        _listener = QueueListener(log_queue, gelf_handler, respect_handler_level=True)
+        _listener.start()
+        # flush the queued records on exit
+        atexit.register(_listener.stop)
+
+        # on the root logger, where the modules log, filtered to the records of the package
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.addFilter(PackageFilter())
+        logging.getLogger().addHandler(queue_handler)
+
+    def handle_exception(exc_type, exc_value, exc_traceback):
+        if issubclass(exc_type, KeyboardInterrupt):
+            sys.__excepthook__(exc_type, exc_value, exc_traceback)
+            return
+        logger.critical("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
+
+    sys.excepthook = handle_exception
+
+    return logger
@@ -1,13 +1,148 @@
 from contextlib import contextmanager
+from datetime import timedelta
+
+from sqlalchemy import bindparam, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
 
 from dustwarning import db
+from dustwarning.metrics import ROWS_UPSERTED, timed_transaction
+from dustwarning.models import Boundary, DustWarning, LatestForecast, WarningChange
+
+# Simplified Web Mercator copies of the boundaries, used by the tile function instead of the full resolution geometry.
+# Each entry is (column, tolerance in degrees, highest zoom the column is used for)
+SIMPLIFIED_GEOMETRIES = [
+    ("geom_low", 0.02, 4),
+    ("geom_medium", 0.002, 7),
+]
 
 
 @contextmanager
-def transaction():
-    try:
-        yield
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-        raise
+def transaction(name="transaction"):
+    with timed_transaction(name):
+        try:
+            yield
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def upsert_warnings(warnings_rows):
+    """Insert or update many warning rows in a single batched statement, returning the ids of the rows written.
+
+    Conflicts are resolved on the unique (gid, init_date, forecast_date) constraint. A stored row is only
+    rewritten when its value differs, so re-loading the same init_date leaves unchanged rows untouched and
+    out of the returned ids.
+    """
+    if not warnings_rows:
+        return []
+
+    table = DustWarning.__table__
+
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        constraint="unique_dust_warming_date",
+        set_={"value": stmt.excluded.value},
+        where=table.c.value.is_distinct_from(stmt.excluded.value)
+    ).returning(table.c.id)
+
+    written_ids = db.session.execute(stmt, warnings_rows).scalars().all()
+    ROWS_UPSERTED.labels(table=DustWarning.__tablename__).inc(len(written_ids))
+
+    return written_ids
+
+
+def record_warning_changes(init_date, country_isos):
+    """Store the change set of init_date for the given countries, replacing any previous one.
+
+    Each region whose value for a forecast date differs from the one forecast by the previous init_date is
+    recorded, computed in a single INSERT ... SELECT. The last forecast date of a run has no previous value.
+    """
+    if not country_isos:
+        return 0
+
+    gids = select(Boundary.gid).where(Boundary.country_iso.in_(country_isos))
+
+    db.session.execute(delete(WarningChange).where(WarningChange.init_date == init_date,
+                                                   WarningChange.gid.in_(gids)))
+
+    current = aliased(DustWarning)
+    previous = aliased(DustWarning)
+
+    changes = select(
+        current.init_date,
+        current.gid,
+        current.forecast_date,
+        func.extract("day", current.forecast_date - current.init_date).cast(db.Integer),
+        previous.value,
+        current.value,
+    ).join(previous, (previous.gid == current.gid) &
+           (previous.forecast_date == current.forecast_date) &
+           (previous.init_date == literal(init_date - timedelta(days=1)))) \
+        .where(current.init_date == init_date,
+               current.gid.in_(gids),
+               current.value.is_distinct_from(previous.value))
+
+    stmt = insert(WarningChange.__table__).from_select(
+        ["init_date", "gid", "forecast_date", "lead_day", "previous_value", "value"], changes
+    )
+
+    return db.session.execute(stmt).rowcount
+
+
+def update_latest_forecasts(country_isos, init_date):
+    """Record init_date as the latest forecast of the given countries, never moving a country backwards"""
+    if not country_isos:
+        return
+
+    rows = [{"country_iso": country_iso, "init_date": init_date, "updated_at": func.now()}
+            for country_iso in country_isos]
+
+    stmt = insert(LatestForecast.__table__).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LatestForecast.country_iso],
+        set_={"init_date": stmt.excluded.init_date, "updated_at": stmt.excluded.updated_at},
+        where=LatestForecast.__table__.c.init_date <= stmt.excluded.init_date
+    )
+
+    db.session.execute(stmt)
+
+
+def upsert_boundaries(boundaries_rows):
+    """Insert or update many boundaries in a single batched statement.
+
+    Each row carries its geometry as a GeoJSON string under "geojson", converted by PostGIS on insert.
+    """
+    if not boundaries_rows:
+        return 0
+
+    stmt = insert(Boundary.__table__).values(
+        geom=func.ST_Multi(func.ST_GeomFromGeoJSON(bindparam("geojson", type_=db.Text))),
+        updated_at=func.now()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Boundary.gid],
+        set_={
+            "country_iso": stmt.excluded.country_iso,
+            "name": stmt.excluded.name,
+            "geom": stmt.excluded.geom,
+            "updated_at": stmt.excluded.updated_at,
+        }
+    )
+
+    db.session.execute(stmt, boundaries_rows)
+    ROWS_UPSERTED.labels(table=Boundary.__tablename__).inc(len(boundaries_rows))
+
+    return len(boundaries_rows)
+
+
+def update_derived_geometries(country_iso):
+    """Recompute the Web Mercator and simplified geometry columns of a country from its full resolution geometry"""
+    values = {
+        column: func.ST_Transform(func.ST_Multi(func.ST_SimplifyPreserveTopology(Boundary.geom, tolerance)), 3857)
+        for column, tolerance, _ in SIMPLIFIED_GEOMETRIES
+    }
+    values["geom_3857"] = func.ST_Transform(Boundary.geom, 3857)
+
+    db.session.execute(update(Boundary).where(Boundary.country_iso == country_iso).values(**values))
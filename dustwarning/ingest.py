@@ -0,0 +1,280 @@
+import logging
+import os
+from datetime import datetime, time, timedelta
+from time import perf_counter
+
+import pytz
+
+from dustwarning import db
+from .alerts import notify_subscribers
+from .errors import IncompleteWarningsFetch, WarningsNotFound
+from .events import get_new_countries, record_forecast_event
+from .helpers import transaction, upsert_warnings, update_latest_forecasts, record_warning_changes
+from .mapping import boundary_config
+from .metrics import FEATURES_PARSED
+from .partitions import ensure_warning_partition
+from .skill import update_forecast_skill
+from .tiles import pregenerate_tiles as render_tiles
+from .utils import read_state, get_next_day, fetch_warnings_files, update_state, read_ingestion_state, \
+    update_ingestion_state, iter_geojson_features
+from dustwarning.config import SETTINGS
+
+COUNTRY_ISO_CODES = SETTINGS.get("COUNTRY_ISO_CODES")
+
+# AEMET publishes the forecast of a day around midday, Paris time
+PUBLICATION_TIMEZONE = pytz.timezone('Europe/Paris')
+PUBLICATION_TIME = time(12, 5)
+
+# outcomes of an ingestion run
+SKIPPED = "skipped"
+INCOMPLETE = "incomplete"
+COMPLETE = "complete"
+
+
+def parse_warnings(features, config, init_date, forecast_date):
+    """Turn the features of one AEMET warnings file into rows keyed on (gid, forecast_date)"""
+    country_iso = config.get("iso")
+    id_field = config.get("id_field")
+    name_field = config.get("name_field")
+
+    warnings_data = {}
+    features_count = 0
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+
+    for feature in features:
+        features_count += 1
+
+        props = feature.get("properties")
+
+        id_prop = props.get(id_field)
+        name = props.get(name_field)
+
+        if id_prop is None and name is None:
+            raise IncompleteWarningsFetch("Feature without id and name")
+
+        gid = f"{country_iso}_{id_prop}"
+        value = props["value"]
+
+        if debug:
+            logging.debug(f"[WARNINGS]: {gid} {forecast_date:%Y-%m-%d} value {value}")
+
+        # keyed on the unique constraint columns so that a repeated
+        # feature cannot hit the same row twice in one upsert
+        warnings_data[(gid, forecast_date)] = {
+            "gid": gid,
+            "init_date": init_date,
+            "forecast_date": forecast_date,
+            "value": value
+        }
+
+    FEATURES_PARSED.labels(country_iso=country_iso).inc(features_count)
+
+    if not warnings_data:
+        raise WarningsNotFound("No features found")
+
+    return warnings_data
+
+
+def get_next_init_date():
+    """The init_date the next ingestion run loads, the day after the last complete one"""
+    last_update = read_state().get("last_update")
+
+    if last_update:
+        return get_next_day(last_update)
+
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_publication_time(init_date):
+    """When AEMET is likely to have published the forecast of init_date, as an aware Europe/Paris datetime"""
+    return PUBLICATION_TIMEZONE.localize(datetime.combine(init_date.date(), PUBLICATION_TIME))
+
+
+def ingest_warnings(check_window=True):
+    """Fetch, parse and commit the warnings of the next init_date.
+
+    Returns SKIPPED when there is nothing to do yet, INCOMPLETE when some countries are still missing
+    and COMPLETE once every country of the init_date is committed.
+    """
+    if not COUNTRY_ISO_CODES:
+        logging.info("[WARNING LOADING]: No country ISO codes provided")
+        return SKIPPED
+
+    day_vals = ["0", "1", "2"]
+
+    next_update = get_next_init_date()
+
+    current_time_utc_plus_one = datetime.now(PUBLICATION_TIMEZONE)
+
+    # only run after 12:05 UTC+1
+    # This is the time when the AEMET data is likely to have been updated
+    if check_window and current_time_utc_plus_one < current_time_utc_plus_one.replace(
+            hour=PUBLICATION_TIME.hour, minute=PUBLICATION_TIME.minute):
+        logging.warning(f"[WARNINGS]: Skipping warnings update as it is before 12:05 UTC+1. "
+                        f"Current time is {current_time_utc_plus_one}")
+        return SKIPPED
+
+    if next_update:
+        next_update_str = next_update.strftime("%Y%m%d")
+        next_update_str_iso = next_update.isoformat()
+
+        # status of every (country, day) already handled for this init_date
+        ingestion_state = read_ingestion_state(next_update_str_iso)
+
+        countries = [boundary_config.get(country_code) for country_code in COUNTRY_ISO_CODES
+                     if boundary_config.get(country_code)]
+
+        pending = {}
+
+        for config in countries:
+            country_state = ingestion_state.setdefault(config.get("iso"), {})
+            pending_days = [day_val for day_val in day_vals
+                            if country_state.get(day_val, {}).get("status") != "committed"]
+
+            if pending_days:
+                pending[config.get("iso")] = pending_days
+
+        # fetch only the missing pieces, concurrently, then process the results in order
+        url_labels = {
+            config.get("geojson_url_template").format(date_str=next_update_str, day_val=day_val): {
+                "country_iso": config.get("iso"), "day": day_val
+            }
+            for config in countries for day_val in pending.get(config.get("iso"), [])
+        }
+        urls = list(url_labels)
+
+        logging.info(f"[WARNINGS]: Fetching {len(urls)} warning files for date {next_update_str}")
+
+        fetch_durations = {}
+        fetched = fetch_warnings_files(urls, labels=url_labels, durations=fetch_durations) if urls else {}
+
+        warnings_rows = []
+        loaded_pieces = []
+        loaded_countries = []
+        # one summary event per country and day, logged once its final status is known
+        piece_events = []
+
+        for config in countries:
+            country_iso = config.get("iso")
+            pending_days = pending.get(country_iso)
+
+            if not pending_days:
+                continue
+
+            country_state = ingestion_state[country_iso]
+            country_rows = []
+            complete = True
+
+            for day_val in pending_days:
+                forecast_date = next_update + timedelta(days=int(day_val))
+
+                geojson_url = config.get("geojson_url_template").format(date_str=next_update_str, day_val=day_val)
+
+                piece_state = {"fetched_at": datetime.now().isoformat()}
+                piece_event = {
+                    "country_iso": country_iso,
+                    "day": int(day_val),
+                    "init_date": next_update_str,
+                    "rows": 0,
+                    "bytes": 0,
+                    "fetch_seconds": round(fetch_durations.get(geojson_url, 0), 3),
+                }
+                start = perf_counter()
+
+                try:
+                    result = fetched.get(geojson_url)
+
+                    if isinstance(result, Exception):
+                        raise result
+
+                    payload_path, payload_hash = result
+                    piece_state["payload_hash"] = payload_hash
+                    piece_event["bytes"] = os.path.getsize(payload_path)
+
+                    with open(payload_path, "rb") as f:
+                        features = iter_geojson_features(f)
+                        piece_rows = parse_warnings(features, config, next_update, forecast_date)
+                    country_rows.extend(piece_rows.values())
+                    piece_event["rows"] = len(piece_rows)
+                    piece_state["status"] = "fetched"
+
+                except Exception as e:
+                    piece_state.update({"status": "failed", "error": str(e)})
+                    piece_event["error"] = f"{geojson_url}: {e}"
+                    complete = False
+
+                piece_event["parse_seconds"] = round(perf_counter() - start, 3)
+                piece_events.append(piece_event)
+                country_state[day_val] = piece_state
+
+            # nothing is committed for a country unless all its days arrived
+            if complete:
+                warnings_rows.extend(country_rows)
+                loaded_pieces.extend(country_state[day_val] for day_val in pending_days)
+                loaded_countries.append(country_iso)
+
+        # write the countries that completed in this run in one transaction
+        if warnings_rows:
+            start = perf_counter()
+
+            with transaction("load_warnings"):
+                ensure_warning_partition(next_update)
+                written_ids = upsert_warnings(warnings_rows)
+                changes_count = record_warning_changes(next_update, loaded_countries)
+                # only the rows written by this load can raise new alerts
+                notifications_count = notify_subscribers(next_update, written_ids)
+                # reloading an init_date already announced for a country does not announce it again
+                record_forecast_event(next_update, get_new_countries(next_update, loaded_countries))
+                update_latest_forecasts(loaded_countries, next_update)
+                # the day 0 forecast of next_update completes the lead comparisons of that date
+                update_forecast_skill(next_update, loaded_countries)
+
+            committed_at = datetime.now().isoformat()
+
+            for piece_state in loaded_pieces:
+                piece_state.update({"status": "committed", "committed_at": committed_at})
+
+            logging.info(f"[WARNINGS]: Wrote {len(written_ids)} of {len(warnings_rows)} warnings for date "
+                         f"{next_update_str}, {changes_count} changed since the previous forecast, "
+                         f"{notifications_count} alerts sent",
+                         extra={"init_date": next_update_str, "countries": len(loaded_countries),
+                                "rows": len(warnings_rows), "written": len(written_ids), "changes": changes_count,
+                                "notifications": notifications_count,
+                                "commit_seconds": round(perf_counter() - start, 3)})
+
+        for piece_event in piece_events:
+            piece_event["status"] = ingestion_state[piece_event["country_iso"]][str(piece_event["day"])]["status"]
+            message = f"[WARNINGS]: {piece_event['country_iso']} day {piece_event['day']} {piece_event['status']}, " \
+                      f"{piece_event['rows']} rows, {piece_event['bytes']} bytes"
+
+            if piece_event.get("error"):
+                logging.warning(f"{message}: {piece_event['error']}", extra=piece_event)
+            else:
+                logging.info(message, extra=piece_event)
+
+        done = all(ingestion_state[config.get("iso")].get(day_val, {}).get("status") == "committed"
+                   for config in countries for day_val in day_vals)
+
+        update_ingestion_state(next_update_str_iso, ingestion_state)
+
+        if done:
+            update_state(next_update_str_iso)
+
+        # the new init_date replaces the pre-rendered tiles of these countries. Rendering comes after the state
+        # is saved, so that a tile cache failure never makes the next runs load the same warnings again
+        if loaded_countries:
+            try:
+                render_tiles(loaded_countries)
+            except Exception as e:
+                db.session.rollback()
+                logging.exception(f"[TILES]: Rendering the tiles of date {next_update_str} failed, "
+                                  f"run pregenerate_tiles to retry: {e}")
+
+        if not done:
+            logging.warning(f"[WARNINGS]: Warnings for date {next_update_str} are incomplete, "
+                            f"the missing countries will be retried on the next run")
+            return INCOMPLETE
+
+        logging.info(f"[WARNINGS]: Done fetching warnings for date {next_update_str}")
+        return COMPLETE
+    return SKIPPED
@@ -1,3 +1,11 @@
+# Labels of the AEMET dust warning values, as used in the vector tiles
+warning_levels = {
+    0: "Normal",
+    1: "High",
+    2: "Very High",
+    3: "Extremely High",
+}
+
 boundary_config = {
     "BFA": {
         "country": "Burkina Faso",
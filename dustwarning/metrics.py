@@ -0,0 +1,131 @@
+"""Prometheus metrics of the ingestion and the API.
+
+Under gunicorn, PROMETHEUS_MULTIPROC_DIR must point to a directory shared by the workers and the ingestion
+commands, and emptied when the server starts (see gunicorn.conf.py). Every metric has labels, so that a
+process only creates its files once it records something. The commands write to files named after them rather than
+their pid, see use_command_files.
+"""
+import fcntl
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, \
+    generate_latest, multiprocess, values
+
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    # the ingestion commands may run before the server created it
+    os.makedirs(os.getenv("PROMETHEUS_MULTIPROC_DIR"), exist_ok=True)
+
+FETCH_SECONDS = Histogram(
+    "dustwarning_fetch_seconds", "Time to fetch one AEMET warnings file",
+    ["country_iso", "day", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+FETCH_BYTES = Counter(
+    "dustwarning_fetch_bytes_total", "Bytes downloaded from AEMET, 304 responses excluded", ["host"]
+)
+FEATURES_PARSED = Counter(
+    "dustwarning_features_parsed_total", "GeoJSON features parsed from the warning files", ["country_iso"]
+)
+ROWS_UPSERTED = Counter(
+    "dustwarning_rows_upserted_total", "Rows inserted or changed by upserts", ["table"]
+)
+TRANSACTION_SECONDS = Histogram(
+    "dustwarning_transaction_seconds", "Duration of the database transactions, commit included",
+    ["name", "outcome"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+CACHE_REQUESTS = Counter(
+    "dustwarning_cache_requests_total", "Lookups in the response caches, by result (hit or miss)",
+    ["cache", "result"]
+)
+WEBHOOK_DELIVERIES = Counter(
+    "dustwarning_webhook_deliveries_total", "Webhook delivery attempts, by outcome (delivered or failed)",
+    ["outcome"]
+)
+REQUEST_SECONDS = Histogram(
+    "dustwarning_request_seconds", "API request latency", ["endpoint", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# lock on the metric files of the running command, held until it exits
+_command_lock = None
+
+
+def use_command_files(command):
+    """Record the metrics of a command in files named after it, which its next runs carry on.
+
+    The commands run from cron, one process per run, and files named after their pids would pile up in
+    PROMETHEUS_MULTIPROC_DIR until the server restarts. A run overlapping another run of the same command keeps its
+    metrics in memory instead of writing to the files in use.
+    """
+    global _command_lock
+
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not multiproc_dir:
+        return
+
+    # the collector reads the type of a metric file up to the first underscore of its name
+    identifier = "command-" + command.replace("_", "-")
+
+    lock = open(os.path.join(multiproc_dir, f"{identifier}.lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        values.ValueClass = values.MutexValue
+        return
+
+    _command_lock = lock
+    values.ValueClass = values.MultiProcessValue(lambda: identifier)
+
+
+def get_registry():
+    """The registry to expose, aggregating the files of every process in multiprocess mode"""
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+
+    return registry
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+@contextmanager
+def timed_transaction(name):
+    start = time.perf_counter()
+    outcome = "rollback"
+
+    try:
+        yield
+        outcome = "commit"
+    finally:
+        TRANSACTION_SECONDS.labels(name=name, outcome=outcome).observe(time.perf_counter() - start)
+
+
+def metrics_view():
+    return Response(generate_latest(get_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
+def instrument_blueprint(blueprint):
+    """Record the latency of every request handled by the blueprint"""
+
+    @blueprint.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @blueprint.after_request
+    def observe_latency(response):
+        start = g.pop("request_start", None)
+
+        if start is not None:
+            REQUEST_SECONDS.labels(endpoint=request.endpoint or "", method=request.method,
+                                   status=response.status_code).observe(time.perf_counter() - start)
+
+        return response
@@ -5,4 +5,5 @@ def dump_datetime(value):
     return [value.strftime("%Y-%m-%d"), value.strftime("%H:%M:%S")]
 
 
-from dustwarning.models.dustwarning import Boundary, DustWarning
+from dustwarning.models.dustwarning import Boundary, DustWarning, LatestForecast, TileCache, ForecastSkill, \
+    WarningChange, ForecastEvent, WebhookDelivery, Subscription, Notification
@@ -1,4 +1,5 @@
 from geoalchemy2 import Geometry
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 
 from dustwarning import db
 
@@ -10,12 +11,23 @@ class Boundary(db.Model):
     country_iso = db.Column(db.String(3), nullable=False)
     name = db.Column(db.String(256), nullable=False)
     geom = db.Column(Geometry(geometry_type="MultiPolygon", srid=4326), nullable=False)
+    # Web Mercator copies of geom used for tiles, filled in by load_boundaries.
+    # geom_low and geom_medium are simplified for low zoom tiles
+    geom_3857 = db.Column(Geometry(geometry_type="MultiPolygon", srid=3857))
+    geom_low = db.Column(Geometry(geometry_type="MultiPolygon", srid=3857, spatial_index=False))
+    geom_medium = db.Column(Geometry(geometry_type="MultiPolygon", srid=3857, spatial_index=False))
+    updated_at = db.Column(db.DateTime)
 
-    def __init__(self, gid, country_iso, name, geom):
+    def __init__(self, gid, country_iso, name, geom, geom_3857=None, geom_low=None, geom_medium=None,
+                 updated_at=None):
         self.gid = gid
         self.country_iso = country_iso
         self.name = name
         self.geom = geom
+        self.geom_3857 = geom_3857
+        self.geom_low = geom_low
+        self.geom_medium = geom_medium
+        self.updated_at = updated_at
 
     def __repr__(self):
         return '<Boundary %r>' % self.name
@@ -35,11 +47,14 @@ class DustWarning(db.Model):
     __tablename__ = "aemet_dust_warning"
     __table_args__ = (
         db.UniqueConstraint("gid", "init_date", "forecast_date", name='unique_dust_warming_date'),
+        db.Index("idx_aemet_dust_warning_init_forecast_gid", "init_date", "forecast_date", "gid"),
+        # monthly partitions, created by load_warnings and pruned by prune_warnings
+        {"postgresql_partition_by": "RANGE (init_date)"},
     )
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     gid = db.Column(db.String(256), db.ForeignKey('aemet_country_boundary.gid', ondelete="CASCADE"), nullable=False)
-    init_date = db.Column(db.DateTime, nullable=False)
+    init_date = db.Column(db.DateTime, primary_key=True)
     forecast_date = db.Column(db.DateTime, nullable=False)
     value = db.Column(db.Integer, nullable=False)
 
@@ -63,3 +78,235 @@ class DustWarning(db.Model):
         }
 
         return dust_warning
+
+
+class WarningChange(db.Model):
+    """Region whose forecast for a date changed from the previous init_date to init_date, kept by load_warnings"""
+    __tablename__ = "aemet_warning_change"
+
+    init_date = db.Column(db.DateTime, primary_key=True)
+    gid = db.Column(db.String(256), primary_key=True)
+    forecast_date = db.Column(db.DateTime, primary_key=True)
+    lead_day = db.Column(db.Integer, nullable=False)
+    previous_value = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.Integer, nullable=False)
+
+    def __init__(self, init_date, gid, forecast_date, lead_day, previous_value, value):
+        self.init_date = init_date
+        self.gid = gid
+        self.forecast_date = forecast_date
+        self.lead_day = lead_day
+        self.previous_value = previous_value
+        self.value = value
+
+    def __repr__(self):
+        return '<WarningChange %r %r %r>' % (self.init_date, self.gid, self.forecast_date)
+
+
+class ForecastEvent(db.Model):
+    """New init_date committed by load_warnings for some countries, pushed to the event stream and the webhooks"""
+    __tablename__ = "aemet_forecast_event"
+
+    id = db.Column(db.Integer, primary_key=True)
+    init_date = db.Column(db.DateTime, nullable=False)
+    payload = db.Column(JSONB, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    def __init__(self, init_date, payload, created_at=None):
+        self.init_date = init_date
+        self.payload = payload
+        self.created_at = created_at
+
+    def __repr__(self):
+        return '<ForecastEvent %r %r>' % (self.id, self.init_date)
+
+
+class WebhookDelivery(db.Model):
+    """Pending or done delivery to a webhook url, retried by deliver_webhooks until it succeeds.
+
+    It posts either a forecast event or, for the deliveries queued by the webhook notification sink, its own payload.
+    """
+    __tablename__ = "aemet_webhook_delivery"
+    __table_args__ = (
+        db.Index("ix_aemet_webhook_delivery_pending", "next_attempt_at",
+                 postgresql_where=db.text("delivered_at IS NULL")),
+        db.CheckConstraint("event_id IS NOT NULL OR payload IS NOT NULL", name="ck_aemet_webhook_delivery_body"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey("aemet_forecast_event.id", ondelete="CASCADE"))
+    payload = db.Column(JSONB)
+    url = db.Column(db.String(2048), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    delivered_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    def __init__(self, url, event_id=None, payload=None, attempts=0, next_attempt_at=None, delivered_at=None,
+                 last_error=None):
+        self.event_id = event_id
+        self.payload = payload
+        self.url = url
+        self.attempts = attempts
+        self.next_attempt_at = next_attempt_at
+        self.delivered_at = delivered_at
+        self.last_error = last_error
+
+    def __repr__(self):
+        return '<WebhookDelivery %r %r>' % (self.event_id, self.url)
+
+
+class Subscription(db.Model):
+    """Alert on the regions of a country, or on a single region, reaching threshold at one of lead_days.
+
+    Any lead day matches when lead_days is empty. Its notifications go to the sink of that name, at target.
+    """
+    __tablename__ = "aemet_subscription"
+    __table_args__ = (
+        db.CheckConstraint("country_iso IS NOT NULL OR gid IS NOT NULL", name="ck_aemet_subscription_area"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(256), nullable=False)
+    country_iso = db.Column(db.String(3))
+    gid = db.Column(db.String(256), db.ForeignKey('aemet_country_boundary.gid', ondelete="CASCADE"))
+    threshold = db.Column(db.Integer, nullable=False)
+    lead_days = db.Column(ARRAY(db.Integer))
+    sink = db.Column(db.String(32), nullable=False, default="log")
+    target = db.Column(db.String(2048))
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    def __init__(self, name, threshold, country_iso=None, gid=None, lead_days=None, sink="log", target=None,
+                 active=True, created_at=None):
+        self.name = name
+        self.threshold = threshold
+        self.country_iso = country_iso
+        self.gid = gid
+        self.lead_days = lead_days
+        self.sink = sink
+        self.target = target
+        self.active = active
+        self.created_at = created_at
+
+    def __repr__(self):
+        return '<Subscription %r %r>' % (self.id, self.name)
+
+
+class Notification(db.Model):
+    """Region of a subscription forecast at or above its threshold, notified once per forecast date"""
+    __tablename__ = "aemet_notification"
+    __table_args__ = (
+        db.UniqueConstraint("subscription_id", "gid", "forecast_date", name="unique_notification_forecast"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subscription_id = db.Column(db.Integer, db.ForeignKey("aemet_subscription.id", ondelete="CASCADE"),
+                                nullable=False)
+    gid = db.Column(db.String(256), nullable=False)
+    init_date = db.Column(db.DateTime, nullable=False)
+    forecast_date = db.Column(db.DateTime, nullable=False)
+    lead_day = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    def __init__(self, subscription_id, gid, init_date, forecast_date, lead_day, value, created_at=None):
+        self.subscription_id = subscription_id
+        self.gid = gid
+        self.init_date = init_date
+        self.forecast_date = forecast_date
+        self.lead_day = lead_day
+        self.value = value
+        self.created_at = created_at
+
+    def __repr__(self):
+        return '<Notification %r %r %r>' % (self.subscription_id, self.gid, self.forecast_date)
+
+
+class LatestForecast(db.Model):
+    """Latest init_date loaded for each country, kept up to date by load_warnings"""
+    __tablename__ = "aemet_latest_forecast"
+
+    country_iso = db.Column(db.String(3), primary_key=True)
+    init_date = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, country_iso, init_date, updated_at):
+        self.country_iso = country_iso
+        self.init_date = init_date
+        self.updated_at = updated_at
+
+    def __repr__(self):
+        return '<LatestForecast %r>' % self.country_iso
+
+    def serialize(self):
+        """Return object data in easily serializable format"""
+        latest_forecast = {
+            "country_iso": self.country_iso,
+            "init_date": self.init_date,
+            "updated_at": self.updated_at,
+        }
+
+        return latest_forecast
+
+
+class TileCache(db.Model):
+    """Vector tiles rendered by public.aemet_dust_warnings after each load, served as-is by the API"""
+    __tablename__ = "aemet_tile_cache"
+
+    country_iso = db.Column(db.String(3), primary_key=True)
+    forecast_date = db.Column(db.DateTime, primary_key=True)
+    z = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    x = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    y = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    init_date = db.Column(db.DateTime, nullable=False)
+    tile = db.Column(db.LargeBinary, nullable=False)
+    etag = db.Column(db.String(32), nullable=False)
+
+    def __init__(self, country_iso, forecast_date, z, x, y, init_date, tile, etag):
+        self.country_iso = country_iso
+        self.forecast_date = forecast_date
+        self.z = z
+        self.x = x
+        self.y = y
+        self.init_date = init_date
+        self.tile = tile
+        self.etag = etag
+
+    def __repr__(self):
+        return '<TileCache %r/%r/%r/%r/%r>' % (self.country_iso, self.forecast_date, self.z, self.x, self.y)
+
+
+class ForecastSkill(db.Model):
+    """Agreement between two lead days forecasting the same date, summed over the regions of a country.
+
+    An event is a level at or above SKILL_THRESHOLD, the reference_lead forecast being taken as the outcome.
+    """
+    __tablename__ = "aemet_forecast_skill"
+
+    country_iso = db.Column(db.String(3), primary_key=True)
+    forecast_date = db.Column(db.DateTime, primary_key=True)
+    lead = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    reference_lead = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    regions = db.Column(db.Integer, nullable=False)
+    agree = db.Column(db.Integer, nullable=False)
+    hits = db.Column(db.Integer, nullable=False)
+    misses = db.Column(db.Integer, nullable=False)
+    false_alarms = db.Column(db.Integer, nullable=False)
+    correct_negatives = db.Column(db.Integer, nullable=False)
+
+    def __init__(self, country_iso, forecast_date, lead, reference_lead, regions, agree, hits, misses, false_alarms,
+                 correct_negatives):
+        self.country_iso = country_iso
+        self.forecast_date = forecast_date
+        self.lead = lead
+        self.reference_lead = reference_lead
+        self.regions = regions
+        self.agree = agree
+        self.hits = hits
+        self.misses = misses
+        self.false_alarms = false_alarms
+        self.correct_negatives = correct_negatives
+
+    def __repr__(self):
+        return '<ForecastSkill %r %r %r/%r>' % (self.country_iso, self.forecast_date, self.lead, self.reference_lead)
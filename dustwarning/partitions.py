@@ -0,0 +1,92 @@
+import logging
+from datetime import date, datetime
+
+from sqlalchemy import delete
+from sqlalchemy.sql import text
+
+from dustwarning import db
+from dustwarning.models import ForecastEvent, Notification, WarningChange
+
+PARTITION_PREFIX = "aemet_dust_warning_"
+
+list_partitions_sql = text("""
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'aemet_dust_warning'::regclass
+    ORDER BY c.relname
+""")
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def previous_month(value):
+    return date(value.year - (value.month == 1), (value.month - 2) % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARTITION_PREFIX}{month:%Y_%m}"
+
+
+def partition_month(name):
+    """Month of a partition from its name, None for tables not named by ensure_warning_partition"""
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y_%m").date()
+    except ValueError:
+        return None
+
+
+def ensure_warning_partition(init_date):
+    """Create the monthly partition of aemet_dust_warning holding init_date, if it does not exist yet"""
+    month = month_start(init_date)
+
+    # the name and bounds only ever come from a date, so they are safe to inline
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF aemet_dust_warning "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+    ))
+
+
+def get_warning_partitions():
+    """Monthly partitions currently attached to aemet_dust_warning, as {name: month}"""
+    names = db.session.execute(list_partitions_sql).scalars().all()
+
+    return {name: partition_month(name) for name in names if partition_month(name)}
+
+
+def prune_warning_partitions(keep_months, drop=False):
+    """Detach, or drop, the partitions older than the last keep_months months.
+
+    Detached partitions stay in the database as standalone tables that can be archived and dropped later.
+    """
+    cutoff = month_start(datetime.now())
+
+    for _ in range(keep_months - 1):
+        cutoff = previous_month(cutoff)
+
+    pruned = []
+
+    for name, month in get_warning_partitions().items():
+        if month >= cutoff:
+            continue
+
+        db.session.execute(text(f"ALTER TABLE aemet_dust_warning DETACH PARTITION {name}"))
+
+        if drop:
+            db.session.execute(text(f"DROP TABLE {name}"))
+
+        logging.info(f"[RETENTION]: {'Dropped' if drop else 'Detached'} partition {name}")
+        pruned.append(name)
+
+    # change sets, events and notifications are only useful alongside the warnings they describe
+    db.session.execute(delete(WarningChange).where(WarningChange.init_date < cutoff))
+    db.session.execute(delete(ForecastEvent).where(ForecastEvent.init_date < cutoff))
+    db.session.execute(delete(Notification).where(Notification.init_date < cutoff))
+
+    return pruned
@@ -0,0 +1,162 @@
+import hashlib
+from datetime import timedelta
+
+from sqlalchemy import bindparam, select
+
+from dustwarning import db
+from dustwarning.caching import LRUCache, ttl_cache
+from dustwarning.config import SETTINGS
+from dustwarning.mapping import warning_levels
+from dustwarning.models import Boundary, DustWarning, LatestForecast, TileCache, WarningChange
+
+API_CACHE_TTL = SETTINGS.get("API_CACHE_TTL", 60)
+API_CACHE_SIZE = SETTINGS.get("API_CACHE_SIZE", 256)
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.000Z"
+
+# keyed on (iso, init_date, forecast_date, updated_at), so neither a new init_date nor a reload of the same one
+# serves stale entries
+warnings_cache = LRUCache(maxsize=API_CACHE_SIZE, name="warnings")
+# keyed on the content of aemet_latest_forecast, which every committed load changes
+available_dates_cache = LRUCache(maxsize=8, name="available_dates")
+# keyed on (iso, init_date, updated_at), so reloading an init_date refreshes its change set
+changes_cache = LRUCache(maxsize=API_CACHE_SIZE, name="changes")
+
+
+# The statements and payload builders below are shared by the Flask routes and the async endpoints of
+# dustwarning.asgi, which only differ in how they execute the statements.
+# The hot statements are built once with bind parameters, so that their cache key is computed once and
+# their compiled form is reused from the engine's compiled cache on every request.
+LATEST_FORECASTS_STMT = select(LatestForecast.country_iso, LatestForecast.init_date, LatestForecast.updated_at)
+
+COUNTRY_WARNINGS_STMT = select(DustWarning.gid, Boundary.name, DustWarning.value) \
+    .join(Boundary, Boundary.gid == DustWarning.gid) \
+    .where(Boundary.country_iso == bindparam("iso"),
+           DustWarning.init_date == bindparam("init_date"),
+           DustWarning.forecast_date == bindparam("forecast_date")) \
+    .order_by(DustWarning.gid)
+
+CHANGES_STMT = select(WarningChange.gid, Boundary.name, WarningChange.forecast_date, WarningChange.lead_day,
+                      WarningChange.previous_value, WarningChange.value) \
+    .join(Boundary, Boundary.gid == WarningChange.gid) \
+    .where(Boundary.country_iso == bindparam("iso"),
+           WarningChange.init_date == bindparam("init_date")) \
+    .order_by(WarningChange.forecast_date, WarningChange.gid)
+
+TILE_STMT = select(TileCache.tile, TileCache.etag) \
+    .where(TileCache.country_iso == bindparam("iso"),
+           TileCache.forecast_date == bindparam("forecast_date"),
+           TileCache.z == bindparam("z"),
+           TileCache.x == bindparam("x"),
+           TileCache.y == bindparam("y"))
+
+
+def build_latest_forecasts(rows):
+    return {country_iso: (init_date, updated_at) for country_iso, init_date, updated_at in rows}
+
+
+@ttl_cache(API_CACHE_TTL)
+def get_latest_forecasts():
+    """Latest init_date and its load time per country, as {iso: (init_date, updated_at)}"""
+    return build_latest_forecasts(db.session.execute(LATEST_FORECASTS_STMT))
+
+
+def build_country_warnings(rows):
+    return [
+        {
+            "gid": gid,
+            "name": name,
+            "value": value,
+            "level": warning_levels.get(value, "Unknown"),
+        }
+        for gid, name, value in rows
+    ]
+
+
+def get_country_warnings(iso, init_date, forecast_date, updated_at):
+    """Warning value and level of every region of a country, for one run and forecast date.
+
+    updated_at is the time the run was last loaded for the country, from aemet_latest_forecast.
+    """
+
+    def query():
+        params = {"iso": iso, "init_date": init_date, "forecast_date": forecast_date}
+        return build_country_warnings(db.session.execute(COUNTRY_WARNINGS_STMT, params))
+
+    return warnings_cache.get_or_set((iso, init_date, forecast_date, updated_at), query)
+
+
+def build_changes(rows):
+    return [
+        {
+            "gid": gid,
+            "name": name,
+            "forecast_date": forecast_date.strftime(DATE_FORMAT),
+            "lead_day": lead_day,
+            "previous_value": previous_value,
+            "value": value,
+            "direction": "up" if value > previous_value else "down",
+        }
+        for gid, name, forecast_date, lead_day, previous_value, value in rows
+    ]
+
+
+def get_changes(iso, init_date, updated_at):
+    """Regions of a country whose warning changed from the previous init_date's forecast of the same date"""
+
+    def query():
+        return build_changes(db.session.execute(CHANGES_STMT, {"iso": iso, "init_date": init_date}))
+
+    return changes_cache.get_or_set((iso, init_date, updated_at), query)
+
+
+def build_warnings_payload(iso, init_date, forecast_date, warnings):
+    return {
+        "country_iso": iso,
+        "init_date": init_date.strftime(DATE_FORMAT),
+        "forecast_date": forecast_date.strftime(DATE_FORMAT),
+        "warnings": warnings,
+    }
+
+
+def warnings_etag(iso, init_date, forecast_date, updated_at):
+    # the content changes when a new init_date is loaded, and when the same one is loaded again
+    return f"{iso}-{init_date:%Y%m%d}-{forecast_date:%Y%m%d}-{updated_at:%Y%m%d%H%M%S}"
+
+
+def get_forecasts_version(latest_forecasts):
+    """Short digest of the latest forecasts, changing whenever a load commits a new init_date"""
+    version = repr(sorted(latest_forecasts.items()))
+
+    return hashlib.md5(version.encode()).hexdigest()
+
+
+def forecast_timestamps(init_date):
+    return [(init_date + timedelta(days=day)).strftime(DATE_FORMAT) for day in range(3)]
+
+
+def build_available_dates(latest_forecasts):
+    countries = {
+        iso: {
+            "init_date": init_date.strftime(DATE_FORMAT),
+            "timestamps": forecast_timestamps(init_date),
+        }
+        for iso, (init_date, _) in sorted(latest_forecasts.items())
+    }
+
+    latest_init_date = max((init_date for init_date, _ in latest_forecasts.values()), default=None)
+
+    return {
+        "timestamps": forecast_timestamps(latest_init_date) if latest_init_date else [],
+        "countries": countries,
+    }
+
+
+def get_available_dates(latest_forecasts=None):
+    """Available init and forecast dates, overall and per country, along with their version"""
+    if latest_forecasts is None:
+        latest_forecasts = get_latest_forecasts()
+
+    version = get_forecasts_version(latest_forecasts)
+
+    return available_dates_cache.get_or_set(version, lambda: build_available_dates(latest_forecasts)), version
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+
+class ResponseCache:
+    """Content addressed on-disk cache of downloaded warning files.
+
+    Bodies are stored once per sha256 under ``objects/`` and the index keeps, per url, the validators
+    (ETag/Last-Modified) needed to make conditional requests, along with cumulative hit/miss counters.
+    """
+
+    def __init__(self, cache_dir, max_age_days=7, max_size_mb=100):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.max_age = max_age_days * 24 * 3600
+        self.max_size = max_size_mb * 1024 * 1024
+        self.lock = threading.Lock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self.index = self._read_index()
+
+    def _read_index(self):
+        index = {}
+
+        if os.path.isfile(self.index_file):
+            try:
+                with open(self.index_file, "r") as f:
+                    index = json.load(f)
+            except json.decoder.JSONDecodeError:
+                logging.warning(f"[CACHE]: Discarding corrupt cache index {self.index_file}")
+
+        index.setdefault("entries", {})
+        index.setdefault("stats", {"hits": 0, "misses": 0, "bytes_saved": 0})
+
+        return index
+
+    def object_path(self, payload_hash):
+        return os.path.join(self.objects_dir, f"{payload_hash}.json")
+
+    def get_entry(self, url):
+        with self.lock:
+            entry = self.index["entries"].get(url)
+
+        # an entry whose body was removed can not answer a 304
+        if entry and not os.path.isfile(self.object_path(entry["sha256"])):
+            return None
+
+        return entry
+
+    def conditional_headers(self, url):
+        entry = self.get_entry(url)
+        headers = {}
+
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    def store(self, url, tmp_path, payload_hash, size, etag=None, last_modified=None):
+        """Move a downloaded body into the object store and point the url at it"""
+        target = self.object_path(payload_hash)
+
+        if os.path.exists(target):
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, target)
+
+        with self.lock:
+            self.index["entries"][url] = {
+                "sha256": payload_hash,
+                "size": size,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": time.time(),
+            }
+
+        return target
+
+    def touch(self, url):
+        with self.lock:
+            entry = self.index["entries"].get(url)
+            if entry:
+                entry["fetched_at"] = time.time()
+
+    def record_hit(self, bytes_saved):
+        with self.lock:
+            self.index["stats"]["hits"] += 1
+            self.index["stats"]["bytes_saved"] += bytes_saved
+
+    def record_miss(self):
+        with self.lock:
+            self.index["stats"]["misses"] += 1
+
+    @property
+    def stats(self):
+        with self.lock:
+            return dict(self.index["stats"])
+
+    def evict(self, keep=()):
+        """Drop entries older than the max age, then the oldest ones until the store fits the max size.
+
+        The entries of the urls in keep, and their bodies, are never dropped, so that the files a caller is
+        about to read stay in place even when they alone exceed the max size.
+        """
+        now = time.time()
+        keep = set(keep)
+
+        with self.lock:
+            entries = self.index["entries"]
+
+            for url, entry in list(entries.items()):
+                if url not in keep and now - entry.get("fetched_at", 0) > self.max_age:
+                    del entries[url]
+
+            sizes = {entry["sha256"]: entry.get("size", 0) for entry in entries.values()}
+            total_size = sum(sizes.values())
+
+            for url, entry in sorted(entries.items(), key=lambda item: item[1].get("fetched_at", 0)):
+                if total_size <= self.max_size:
+                    break
+                if url in keep:
+                    continue
+                del entries[url]
+                if not any(e["sha256"] == entry["sha256"] for e in entries.values()):
+                    total_size -= sizes.get(entry["sha256"], 0)
+
+            referenced = {entry["sha256"] for entry in entries.values()}
+
+        for file_name in os.listdir(self.objects_dir):
+            payload_hash, _ = os.path.splitext(file_name)
+            if payload_hash not in referenced:
+                try:
+                    os.unlink(os.path.join(self.objects_dir, file_name))
+                except OSError:
+                    pass
+
+    def new_temp_file(self):
+        return tempfile.NamedTemporaryFile(delete=False, dir=self.cache_dir, suffix=".part")
+
+    def save(self):
+        with self.lock:
+            content = json.dumps(self.index, indent=4)
+
+        with self.new_temp_file() as f:
+            f.write(content.encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(f.name, self.index_file)
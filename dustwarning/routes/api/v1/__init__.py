@@ -1,5 +1,7 @@
 from flask import Blueprint, jsonify
 
+from dustwarning.metrics import instrument_blueprint
+
 
 # GENERIC Error
 def error(status=400, detail='Bad Request'):
@@ -10,5 +12,6 @@ def error(status=400, detail='Bad Request'):
 
 
 endpoints = Blueprint('endpoints', __name__)
+instrument_blueprint(endpoints)
 
 import dustwarning.routes.api.v1.dustwarning_router
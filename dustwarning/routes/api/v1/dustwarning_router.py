@@ -1,34 +1,266 @@
 import logging
-from datetime import timedelta
+from datetime import datetime
 
-from flask import jsonify
-from sqlalchemy import desc
+from flask import jsonify, request, Response, stream_with_context
 
-from dustwarning.models import DustWarning
+from dustwarning import db
+from dustwarning.config import SETTINGS
+from dustwarning.events import parse_last_event_id, stream_events
+from dustwarning.spatial import resolve_points
+from dustwarning.skill import get_skill_summary
+from dustwarning.stats import get_country_stats
+from dustwarning.queries import get_latest_forecasts, get_country_warnings, get_changes, DATE_FORMAT, TILE_STMT, \
+    get_available_dates as get_available_dates_payload, build_warnings_payload, warnings_etag
 
-from dustwarning.routes.api.v1 import endpoints
+from dustwarning.routes.api.v1 import endpoints, error
+
+TILE_CACHE_MAX_AGE = SETTINGS.get("TILE_CACHE_MAX_AGE", 3600)
+API_CACHE_TTL = SETTINGS.get("API_CACHE_TTL", 60)
+MAX_BATCH_POINTS = 10000
+
+
+def parse_date_param(value):
+    """Parse an optional YYYY-MM-DD parameter, raising ValueError when it is malformed"""
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def parse_coordinate(value, limit):
+    coordinate = float(value)
+    if not -limit <= coordinate <= limit:
+        raise ValueError(f"Coordinate {coordinate} out of range")
+    return coordinate
 
 
 @endpoints.route('/available-forecast-dates.json', strict_slashes=False, methods=['GET'])
 def get_available_dates():
-    logging.info('[ROUTER]: Getting available dates')
+    logging.debug('[ROUTER]: Getting available dates')
+
+    dates, version = get_available_dates_payload()
+
+    response = jsonify(dates)
+
+    response.set_etag(version)
+    response.cache_control.public = True
+    response.cache_control.max_age = API_CACHE_TTL
+
+    return response.make_conditional(request)
+
+
+@endpoints.route('/events', methods=['GET'])
+def get_events():
+    # dustwarning.asgi serves this path itself, this stream is the one of the WSGI deployments
+    try:
+        last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID'))
+    except ValueError:
+        return error(status=400, detail='Invalid Last-Event-ID, expected an event id')
+
+    response = Response(stream_with_context(stream_events(last_event_id)), mimetype="text/event-stream")
+    response.cache_control.no_cache = True
+    response.headers["X-Accel-Buffering"] = "no"
+
+    return response
+
+
+@endpoints.route('/tiles/<iso>/<forecast_date>/<int:z>/<int:x>/<int:y>.pbf', methods=['GET'])
+def get_tile(iso, forecast_date, z, x, y):
+    try:
+        forecast_date = datetime.strptime(forecast_date, "%Y-%m-%d")
+    except ValueError:
+        return error(status=400, detail='Invalid forecast date, expected YYYY-MM-DD')
+
+    tile = db.session.execute(TILE_STMT, {"iso": iso.upper(), "forecast_date": forecast_date,
+                                          "z": z, "x": x, "y": y}).first()
+
+    # tiles outside the country are never rendered
+    if tile is None:
+        response = Response(status=204)
+    else:
+        response = Response(tile.tile, mimetype="application/vnd.mapbox-vector-tile")
+        response.set_etag(tile.etag)
+
+    response.cache_control.public = True
+    response.cache_control.max_age = TILE_CACHE_MAX_AGE
+
+    return response.make_conditional(request)
+
+
+@endpoints.route('/warnings/<iso>/<forecast_date>.json', methods=['GET'])
+def get_warnings(iso, forecast_date):
+    logging.debug('[ROUTER]: Getting warnings')
+
+    iso = iso.upper()
+
+    try:
+        forecast_date = datetime.strptime(forecast_date, "%Y-%m-%d")
+    except ValueError:
+        return error(status=400, detail='Invalid forecast date, expected YYYY-MM-DD')
+
+    latest_forecast = get_latest_forecasts().get(iso)
+
+    if not latest_forecast:
+        return error(status=404, detail='Not Found')
+
+    init_date, updated_at = latest_forecast
+
+    warnings = get_country_warnings(iso, init_date, forecast_date, updated_at)
+
+    if not warnings:
+        return error(status=404, detail='Not Found')
+
+    response = jsonify(build_warnings_payload(iso, init_date, forecast_date, warnings))
+
+    response.set_etag(warnings_etag(iso, init_date, forecast_date, updated_at))
+    response.last_modified = updated_at
+    response.cache_control.public = True
+    response.cache_control.max_age = API_CACHE_TTL
+
+    return response.make_conditional(request)
+
+
+@endpoints.route('/changes/<iso>', methods=['GET'])
+def get_warning_changes(iso):
+    logging.debug('[ROUTER]: Getting warning changes')
+
+    iso = iso.upper()
+
+    try:
+        init_date = parse_date_param(request.args.get('init_date'))
+    except ValueError:
+        return error(status=400, detail='Expected an optional init_date as YYYY-MM-DD')
+
+    latest_forecast = get_latest_forecasts().get(iso)
+
+    if not latest_forecast:
+        return error(status=404, detail='Not Found')
+
+    latest_init_date, updated_at = latest_forecast
+
+    if init_date is None:
+        init_date = latest_init_date
+    elif init_date > latest_init_date:
+        return error(status=404, detail='Not Found')
+
+    response = jsonify({
+        "country_iso": iso,
+        "init_date": init_date.strftime(DATE_FORMAT),
+        "changes": get_changes(iso, init_date, updated_at),
+    })
+
+    response.set_etag(f"{iso}-{init_date:%Y%m%d}-{updated_at:%Y%m%d%H%M%S}-changes")
+    response.last_modified = updated_at
+    response.cache_control.public = True
+    response.cache_control.max_age = API_CACHE_TTL
+
+    return response.make_conditional(request)
+
+
+@endpoints.route('/warnings/point', methods=['GET'])
+def get_point_warning():
+    try:
+        lat = parse_coordinate(request.args.get('lat'), 90)
+        lon = parse_coordinate(request.args.get('lon'), 180)
+        forecast_date = parse_date_param(request.args.get('date'))
+    except (TypeError, ValueError):
+        return error(status=400, detail='Expected lat, lon and an optional date as YYYY-MM-DD')
+
+    result = resolve_points([lon], [lat], forecast_date)[0]
+
+    if result is None:
+        return error(status=404, detail='Not Found')
+
+    return jsonify({"lat": lat, "lon": lon, **result}), 200
+
+
+@endpoints.route('/warnings/points', methods=['POST'])
+def get_points_warnings():
+    body = request.get_json(silent=True)
+    points = body.get("points") if isinstance(body, dict) else None
+
+    try:
+        if not isinstance(points, list) or len(points) > MAX_BATCH_POINTS:
+            raise ValueError("Invalid points")
+        lats = [parse_coordinate(point["lat"], 90) for point in points]
+        lons = [parse_coordinate(point["lon"], 180) for point in points]
+        forecast_date = parse_date_param(body.get("date"))
+    except (KeyError, TypeError, ValueError):
+        return error(status=400, detail=f'Expected up to {MAX_BATCH_POINTS} points as {{"lat", "lon"}} '
+                                        f'and an optional date as YYYY-MM-DD')
+
+    results = resolve_points(lons, lats, forecast_date) if points else []
+
+    return jsonify({"results": results}), 200
+
+
+@endpoints.route('/stats/<iso>', methods=['GET'])
+def get_stats(iso):
+    iso = iso.upper()
+
+    try:
+        start = parse_date_param(request.args.get('start'))
+        end = parse_date_param(request.args.get('end'))
+        lead = int(request.args.get('lead', 0))
+        if not 0 <= lead <= 2:
+            raise ValueError("Invalid lead")
+    except ValueError:
+        return error(status=400, detail='Expected optional start and end as YYYY-MM-DD and lead between 0 and 2')
+
+    latest_forecast = get_latest_forecasts().get(iso)
+
+    if not latest_forecast:
+        return error(status=404, detail='Not Found')
+
+    init_date, updated_at = latest_forecast
+
+    stats = get_country_stats(iso, init_date, updated_at, start=start, end=end, lead=lead)
+
+    response = jsonify({
+        "country_iso": iso,
+        "init_date": init_date.strftime(DATE_FORMAT),
+        "start": start.strftime(DATE_FORMAT) if start else None,
+        "end": end.strftime(DATE_FORMAT) if end else None,
+        "lead": lead,
+        "regions": stats,
+    })
+
+    response.set_etag(f"{iso}-{init_date:%Y%m%d}-{updated_at:%Y%m%d%H%M%S}-stats")
+    response.last_modified = updated_at
+    response.cache_control.public = True
+    response.cache_control.max_age = API_CACHE_TTL
+
+    return response.make_conditional(request)
+
+
+@endpoints.route('/skill/<iso>', methods=['GET'])
+def get_skill(iso):
+    iso = iso.upper()
 
-    dates = []
+    try:
+        start = parse_date_param(request.args.get('start'))
+        end = parse_date_param(request.args.get('end'))
+    except ValueError:
+        return error(status=400, detail='Expected optional start and end as YYYY-MM-DD')
 
-    latest_init_date = DustWarning.query.order_by(desc(DustWarning.init_date)).first()
+    latest_forecast = get_latest_forecasts().get(iso)
 
-    if latest_init_date:
-        latest_init_date = latest_init_date.init_date
-        dates.append(latest_init_date)
+    if not latest_forecast:
+        return error(status=404, detail='Not Found')
 
-        # add next two days
-        for i in range(1, 3):
-            dates.append(latest_init_date + timedelta(days=i))
+    init_date, updated_at = latest_forecast
 
-    dates = [date.strftime("%Y-%m-%dT%H:%M:%S.000Z") for date in dates]
+    response = jsonify({
+        "country_iso": iso,
+        "init_date": init_date.strftime(DATE_FORMAT),
+        "start": start.strftime(DATE_FORMAT) if start else None,
+        "end": end.strftime(DATE_FORMAT) if end else None,
+        "threshold": SETTINGS.get("SKILL_THRESHOLD"),
+        "leads": get_skill_summary(iso, start=start, end=end),
+    })
 
-    response = {
-        "timestamps": dates
-    }
+    response.set_etag(f"{iso}-{init_date:%Y%m%d}-{updated_at:%Y%m%d%H%M%S}-skill")
+    response.last_modified = updated_at
+    response.cache_control.public = True
+    response.cache_control.max_age = API_CACHE_TTL
 
-    return jsonify(response), 200
+    return response.make_conditional(request)
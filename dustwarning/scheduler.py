@@ -0,0 +1,87 @@
+import logging
+import signal
+import threading
+from datetime import datetime
+
+from flask import current_app
+
+from dustwarning import db
+from dustwarning.config import SETTINGS
+from .events import deliver_webhooks
+from .ingest import ingest_warnings, get_next_init_date, get_publication_time, PUBLICATION_TIMEZONE, COMPLETE, \
+    SKIPPED
+from .metrics import get_registry
+from .utils import retry_delay
+
+RETRY_MIN_DELAY = SETTINGS.get("SCHEDULER_RETRY_MIN_DELAY", 60)
+RETRY_MAX_DELAY = SETTINGS.get("SCHEDULER_RETRY_MAX_DELAY", 1800)
+METRICS_PORT = SETTINGS.get("SCHEDULER_METRICS_PORT")
+WEBHOOK_DELIVERY_INTERVAL = SETTINGS.get("WEBHOOK_DELIVERY_INTERVAL", 60)
+
+
+def run_webhook_deliveries(app, stop_event):
+    """Deliver the queued webhooks every WEBHOOK_DELIVERY_INTERVAL seconds, as the cron job does"""
+    with app.app_context():
+        while not stop_event.wait(WEBHOOK_DELIVERY_INTERVAL):
+            try:
+                deliver_webhooks()
+            except Exception as e:
+                logging.exception(f"[SCHEDULER]: Webhook deliveries failed: {e}")
+            finally:
+                db.session.remove()
+
+
+def run_scheduler(stop_event=None):
+    """Ingest each init_date as soon as it is published, from a single long running process.
+
+    The database pool and HTTP session stay warm between runs. Before the publication time the loop sleeps
+    until it, then retries with backoff until every country is committed and moves on to the next day.
+    Queued webhooks are delivered from a background thread.
+    """
+    stop_event = stop_event or threading.Event()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop_event.set())
+
+    if METRICS_PORT:
+        from prometheus_client import start_http_server
+
+        start_http_server(METRICS_PORT, registry=get_registry())
+
+    threading.Thread(target=run_webhook_deliveries, args=(current_app._get_current_object(), stop_event),
+                     name="webhook-deliveries", daemon=True).start()
+
+    attempt = 0
+
+    while not stop_event.is_set():
+        init_date = get_next_init_date()
+        publication_time = get_publication_time(init_date)
+        now = datetime.now(PUBLICATION_TIMEZONE)
+
+        if now < publication_time:
+            logging.info(f"[SCHEDULER]: Next run for date {init_date:%Y%m%d} at {publication_time}")
+            stop_event.wait((publication_time - now).total_seconds())
+            attempt = 0
+            continue
+
+        try:
+            result = ingest_warnings(check_window=False)
+        except Exception as e:
+            logging.exception(f"[SCHEDULER]: Run for date {init_date:%Y%m%d} failed: {e}")
+            result = None
+        finally:
+            # give the connection back to the pool until the next run
+            db.session.remove()
+
+        if result == COMPLETE:
+            attempt = 0
+            continue
+
+        # nothing can be loaded without countries, check again at the slowest pace
+        delay = RETRY_MAX_DELAY if result == SKIPPED else retry_delay(attempt, RETRY_MIN_DELAY, RETRY_MAX_DELAY)
+        attempt += 1
+
+        logging.info(f"[SCHEDULER]: Retrying date {init_date:%Y%m%d} in {round(delay)} seconds")
+        stop_event.wait(delay)
+
+    logging.info("[SCHEDULER]: Stopped")
@@ -0,0 +1,145 @@
+import logging
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import and_, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from dustwarning import db
+from dustwarning.config import SETTINGS
+from dustwarning.models import Boundary, DustWarning, ForecastSkill
+
+SKILL_THRESHOLD = SETTINGS.get("SKILL_THRESHOLD", 1)
+
+# (lead, reference_lead) pairs compared for each forecast date
+LEAD_PAIRS = [(1, 0), (2, 0), (2, 1)]
+MISSING = -1
+
+
+def compute_skill(values, threshold=SKILL_THRESHOLD):
+    """Contingency counts of each lead pair, from a (regions x 3) array of the values forecast at each lead"""
+    results = []
+
+    for lead, reference_lead in LEAD_PAIRS:
+        forecast = values[:, lead]
+        reference = values[:, reference_lead]
+
+        compared = (forecast != MISSING) & (reference != MISSING)
+        forecast_event = compared & (forecast >= threshold)
+        reference_event = compared & (reference >= threshold)
+
+        results.append({
+            "lead": lead,
+            "reference_lead": reference_lead,
+            "regions": int(compared.sum()),
+            "agree": int((compared & (forecast == reference)).sum()),
+            "hits": int((forecast_event & reference_event).sum()),
+            "misses": int((~forecast_event & reference_event).sum()),
+            "false_alarms": int((forecast_event & ~reference_event).sum()),
+            "correct_negatives": int((compared & ~forecast_event & ~reference_event).sum()),
+        })
+
+    return results
+
+
+def iter_country_values(rows, forecast_date):
+    """(country_iso, values) of each country in rows of (country_iso, gid, init_date, value), values being the
+    (regions x 3) array of compute_skill with the regions sorted by gid.
+
+    The array of every region is filled at once, then split by country.
+    """
+    if not rows:
+        return
+
+    country_column, gid_column, init_date_column, value_column = zip(*rows)
+
+    gids, first_rows, gid_index = np.unique(np.array(gid_column), return_index=True, return_inverse=True)
+    leads = (np.datetime64(forecast_date, "D") - np.array(init_date_column, dtype="datetime64[D]")).astype(int)
+
+    values = np.full((len(gids), 3), MISSING, dtype=np.int8)
+    values[gid_index, leads] = value_column
+
+    countries, country_index = np.unique(np.array(country_column)[first_rows], return_inverse=True)
+
+    # the regions grouped by country, in gid order within each
+    order = np.argsort(country_index, kind="stable")
+    splits = np.cumsum(np.bincount(country_index))[:-1]
+
+    yield from zip(countries.tolist(), np.split(values[order], splits))
+
+
+def update_forecast_skill(forecast_date, country_isos):
+    """Compute the skill rows of one forecast date, the one whose day 0 forecast has just been loaded.
+
+    Only the three runs forecasting that date are read, so the work does not grow with the history.
+    """
+    init_dates = [forecast_date - timedelta(days=lead) for lead in range(3)]
+
+    stmt = select(Boundary.country_iso, DustWarning.gid, DustWarning.init_date, DustWarning.value) \
+        .join(Boundary, Boundary.gid == DustWarning.gid) \
+        .where(Boundary.country_iso.in_(country_isos),
+               DustWarning.forecast_date == forecast_date,
+               DustWarning.init_date.in_(init_dates))
+
+    rows = db.session.execute(stmt).all()
+
+    skill_rows = []
+
+    for country_iso, values in iter_country_values(rows, forecast_date):
+        for skill in compute_skill(values):
+            skill_rows.append({"country_iso": country_iso, "forecast_date": forecast_date, **skill})
+
+    if not skill_rows:
+        return 0
+
+    stmt = insert(ForecastSkill.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["country_iso", "forecast_date", "lead", "reference_lead"],
+        set_={column: stmt.excluded[column]
+              for column in ["regions", "agree", "hits", "misses", "false_alarms", "correct_negatives"]}
+    )
+
+    db.session.execute(stmt, skill_rows)
+
+    logging.info(f"[SKILL]: Updated forecast skill of {forecast_date} for {len(skill_rows) // len(LEAD_PAIRS)} "
+                 f"countries")
+
+    return len(skill_rows)
+
+
+def get_skill_summary(country_iso, start=None, end=None):
+    """Sum the daily skill rows of a country over a period, with the usual scores per lead pair"""
+    conditions = [ForecastSkill.country_iso == country_iso]
+
+    if start:
+        conditions.append(ForecastSkill.forecast_date >= start)
+    if end:
+        conditions.append(ForecastSkill.forecast_date <= end)
+
+    columns = ["regions", "agree", "hits", "misses", "false_alarms", "correct_negatives"]
+
+    stmt = select(ForecastSkill.lead, ForecastSkill.reference_lead, func.count(),
+                  *[func.sum(getattr(ForecastSkill, column)) for column in columns]) \
+        .where(and_(*conditions)) \
+        .group_by(ForecastSkill.lead, ForecastSkill.reference_lead) \
+        .order_by(ForecastSkill.lead, ForecastSkill.reference_lead)
+
+    def ratio(numerator, denominator):
+        return round(numerator / denominator, 4) if denominator else None
+
+    summary = []
+
+    for lead, reference_lead, days, *sums in db.session.execute(stmt):
+        counts = dict(zip(columns, (int(value) for value in sums)))
+
+        summary.append({
+            "lead": lead,
+            "reference_lead": reference_lead,
+            "days": days,
+            **counts,
+            "consistency": ratio(counts["agree"], counts["regions"]),
+            "probability_of_detection": ratio(counts["hits"], counts["hits"] + counts["misses"]),
+            "false_alarm_ratio": ratio(counts["false_alarms"], counts["hits"] + counts["false_alarms"]),
+        })
+
+    return summary
@@ -0,0 +1,123 @@
+import logging
+import threading
+
+import shapely
+from shapely import STRtree
+from sqlalchemy import func, select
+
+from dustwarning import db
+from dustwarning.caching import ttl_cache
+from dustwarning.config import SETTINGS
+from dustwarning.models import Boundary
+from dustwarning.queries import DATE_FORMAT, get_country_warnings, get_latest_forecasts
+
+API_CACHE_TTL = SETTINGS.get("API_CACHE_TTL", 60)
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class BoundaryIndex:
+    """In-memory R-tree over the prepared boundary geometries, answering point-in-region lookups"""
+
+    def __init__(self, version, gids, country_isos, geoms):
+        self.version = version
+        self.gids = gids
+        self.country_isos = country_isos
+
+        shapely.prepare(geoms)
+        self.tree = STRtree(geoms)
+
+    def lookup(self, lons, lats):
+        """Return, for each point, the index of the boundary containing it or None"""
+        points = shapely.points(lons, lats)
+
+        # one vectorized query for all the points, as parallel arrays of point and boundary indices
+        point_idx, boundary_idx = self.tree.query(points, predicate="intersects")
+
+        matches = [None] * len(points)
+
+        # a point on a shared border matches both regions, keep the first one
+        for p, b in zip(point_idx.tolist(), boundary_idx.tolist()):
+            if matches[p] is None:
+                matches[p] = b
+
+        return matches
+
+
+@ttl_cache(API_CACHE_TTL)
+def get_boundaries_version():
+    """Changes whenever load_boundaries adds or rewrites a boundary"""
+    count, updated_at = db.session.execute(select(func.count(), func.max(Boundary.updated_at))).one()
+
+    return count, updated_at
+
+
+def get_boundary_index():
+    """Lazily build the boundary index, rebuilding it when the boundaries change"""
+    global _index
+
+    version = get_boundaries_version()
+
+    with _index_lock:
+        if _index is None or _index.version != version:
+            rows = db.session.execute(
+                select(Boundary.gid, Boundary.country_iso, func.ST_AsBinary(Boundary.geom))
+            ).all()
+
+            gids = [gid for gid, _, _ in rows]
+            country_isos = [country_iso for _, country_iso, _ in rows]
+            geoms = shapely.from_wkb([bytes(wkb) for _, _, wkb in rows])
+
+            _index = BoundaryIndex(version, gids, country_isos, geoms)
+
+            logging.info(f"[SPATIAL]: Built boundary index with {len(gids)} boundaries")
+
+        return _index
+
+
+def resolve_points(lons, lats, forecast_date=None):
+    """Warning of the region containing each point, for a forecast date or the latest init_date by default.
+
+    Returns one dict per point, or None when the point is outside every region or has no warning for the date.
+    """
+    index = get_boundary_index()
+    latest_forecasts = get_latest_forecasts()
+
+    # region values of every country involved, each read once from the warnings cache
+    warnings_by_country = {}
+    results = []
+
+    for match in index.lookup(lons, lats):
+        if match is None:
+            results.append(None)
+            continue
+
+        iso = index.country_isos[match]
+
+        if iso not in warnings_by_country:
+            warnings_by_country[iso] = None
+
+            if iso in latest_forecasts:
+                init_date, updated_at = latest_forecasts[iso]
+                country_date = forecast_date or init_date
+                warnings = get_country_warnings(iso, init_date, country_date, updated_at)
+                warnings_by_country[iso] = (init_date, country_date, {w["gid"]: w for w in warnings})
+
+        country_warnings = warnings_by_country[iso]
+        warning = country_warnings and country_warnings[2].get(index.gids[match])
+
+        if not warning:
+            results.append(None)
+            continue
+
+        init_date, country_date, _ = country_warnings
+
+        results.append({
+            "country_iso": iso,
+            "init_date": init_date.strftime(DATE_FORMAT),
+            "forecast_date": country_date.strftime(DATE_FORMAT),
+            **warning,
+        })
+
+    return results
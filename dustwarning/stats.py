@@ -0,0 +1,158 @@
+import numpy as np
+from sqlalchemy import select
+
+from dustwarning import db
+from dustwarning.caching import LRUCache
+from dustwarning.config import SETTINGS
+from dustwarning.models import Boundary, DustWarning
+
+API_CACHE_SIZE = SETTINGS.get("API_CACHE_SIZE", 256)
+
+# levels counted as exceedance, and as a "High" day for the runs
+EXCEEDANCE_LEVEL = 2
+HIGH_LEVEL = 1
+LEAD_DAYS = 3
+MISSING = -1
+
+# keyed on (iso, latest init_date, updated_at), so a new load or a reload of the same init_date rebuilds the arrays
+history_cache = LRUCache(maxsize=16, name="stats_history")
+# keyed on (iso, latest init_date, updated_at, start, end, lead)
+stats_cache = LRUCache(maxsize=API_CACHE_SIZE, name="stats")
+
+
+class WarningsHistory:
+    """Warnings of a country as a dense (regions x init days x lead days) array, MISSING where absent"""
+
+    def __init__(self, gids, names, dates, values):
+        self.gids = gids
+        self.names = names
+        self.dates = dates
+        self.values = values
+
+    @classmethod
+    def load(cls, iso):
+        stmt = select(DustWarning.gid, Boundary.name, DustWarning.init_date, DustWarning.forecast_date,
+                      DustWarning.value) \
+            .join(Boundary, Boundary.gid == DustWarning.gid) \
+            .where(Boundary.country_iso == iso)
+
+        rows = db.session.execute(stmt).all()
+
+        if not rows:
+            return None
+
+        gid_col, name_col, init_col, forecast_col, value_col = zip(*rows)
+
+        gids, gid_idx = np.unique(np.array(gid_col), return_inverse=True)
+        names = dict(zip(gid_col, name_col))
+
+        init_dates = np.array(init_col, dtype="datetime64[D]")
+        forecast_dates = np.array(forecast_col, dtype="datetime64[D]")
+
+        start = init_dates.min()
+        day_idx = (init_dates - start).astype(int)
+        lead_idx = (forecast_dates - init_dates).astype(int)
+
+        values = np.full((len(gids), day_idx.max() + 1, LEAD_DAYS), MISSING, dtype=np.int8)
+
+        in_range = (lead_idx >= 0) & (lead_idx < LEAD_DAYS)
+        values[gid_idx[in_range], day_idx[in_range], lead_idx[in_range]] = np.array(value_col, dtype=np.int8)[in_range]
+
+        dates = start + np.arange(values.shape[1])
+
+        return cls(gids.tolist(), [names[gid] for gid in gids], dates, values)
+
+
+def longest_runs(mask):
+    """Length of the longest run of True along the last axis, for each row"""
+    counts = np.cumsum(mask, axis=1)
+    # count reached at the last False before each position, where the current run started from
+    resets = np.maximum.accumulate(np.where(mask, 0, counts), axis=1)
+
+    return (counts - resets).max(axis=1, initial=0)
+
+
+def trend_per_year(series, years):
+    """Least squares slope of each row of series against years, ignoring NaN"""
+    valid = ~np.isnan(series)
+    n = valid.sum(axis=1)
+
+    x = np.where(valid, years, 0.0)
+    y = np.where(valid, series, 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = x.sum(axis=1) / n
+        y_mean = y.sum(axis=1) / n
+        dx = np.where(valid, years - x_mean[:, None], 0.0)
+        dy = np.where(valid, series - y_mean[:, None], 0.0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+
+    return np.where(n >= 2, slope, np.nan)
+
+
+def compute_stats(history, start=None, end=None, lead=0):
+    """Per region monthly exceedance fractions, longest High run and exceedance trend over a period"""
+    in_period = np.ones(len(history.dates), dtype=bool)
+
+    if start is not None:
+        in_period &= history.dates >= np.datetime64(start, "D")
+    if end is not None:
+        in_period &= history.dates <= np.datetime64(end, "D")
+
+    dates = history.dates[in_period]
+    values = history.values[:, in_period, lead]
+
+    valid = values != MISSING
+    exceed = valid & (values >= EXCEEDANCE_LEVEL)
+
+    # calendar month of each day as a one-hot (days x 12) matrix, to aggregate all regions in one product
+    months = dates.astype("datetime64[M]").astype(int) % 12
+    month_onehot = np.eye(12, dtype=np.int32)[months]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        monthly_fraction = (exceed.astype(np.int32) @ month_onehot) / (valid.astype(np.int32) @ month_onehot)
+
+    # the same per (year, month) for the trend
+    year_months = dates.astype("datetime64[M]").astype(int)
+    unique_year_months, year_month_idx = np.unique(year_months, return_inverse=True)
+    year_month_onehot = np.eye(len(unique_year_months), dtype=np.int32)[year_month_idx]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        year_month_fraction = (exceed.astype(np.int32) @ year_month_onehot) / \
+                              (valid.astype(np.int32) @ year_month_onehot)
+
+    trends = trend_per_year(year_month_fraction, unique_year_months / 12.0)
+    runs = longest_runs(valid & (values >= HIGH_LEVEL))
+    days = valid.sum(axis=1)
+
+    def clean(value):
+        return None if np.isnan(value) else round(float(value), 4)
+
+    return [
+        {
+            "gid": gid,
+            "name": history.names[i],
+            "days": int(days[i]),
+            "monthly_exceedance": {str(month + 1): clean(monthly_fraction[i, month]) for month in range(12)},
+            "longest_high_run": int(runs[i]),
+            "exceedance_trend_per_year": clean(trends[i]),
+        }
+        for i, gid in enumerate(history.gids)
+    ]
+
+
+def get_country_stats(iso, init_date, updated_at, start=None, end=None, lead=0):
+    """Cached statistics of a country.
+
+    init_date and updated_at are those of its latest forecast, so that new loads and reloads are picked up.
+    """
+
+    def build():
+        history = history_cache.get_or_set((iso, init_date, updated_at), lambda: WarningsHistory.load(iso))
+
+        if history is None:
+            return []
+
+        return compute_stats(history, start=start, end=end, lead=lead)
+
+    return stats_cache.get_or_set((iso, init_date, updated_at, start, end, lead), build)
@@ -0,0 +1,111 @@
+import logging
+import math
+from datetime import timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.sql import text
+
+from dustwarning import db
+from dustwarning.config import SETTINGS
+from dustwarning.helpers import transaction
+from dustwarning.models import Boundary, LatestForecast, TileCache
+
+TILE_CACHE_MIN_ZOOM = SETTINGS.get("TILE_CACHE_MIN_ZOOM", 0)
+TILE_CACHE_MAX_ZOOM = SETTINGS.get("TILE_CACHE_MAX_ZOOM", 8)
+
+# Web Mercator latitude limit
+MAX_LATITUDE = 85.0511287798
+
+RENDER_BATCH_SIZE = 256
+
+render_tiles_sql = text("""
+    INSERT INTO aemet_tile_cache (country_iso, forecast_date, z, x, y, init_date, tile, etag)
+    SELECT :iso, :forecast_date, t.z, t.x, t.y, :init_date, m.tile, md5(m.tile)
+    FROM unnest(CAST(:zs AS integer[]), CAST(:xs AS integer[]), CAST(:ys AS integer[])) AS t(z, x, y)
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(public.aemet_dust_warnings(t.z, t.x, t.y, :iso, :forecast_date), ''::bytea) AS tile
+    ) m
+    ON CONFLICT (country_iso, forecast_date, z, x, y) DO UPDATE
+    SET init_date = excluded.init_date, tile = excluded.tile, etag = excluded.etag
+""")
+
+
+def lonlat_to_tile(lon, lat, z):
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    n = 2 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def iter_tiles(bounds, min_zoom, max_zoom):
+    """Yield the (z, x, y) of every tile intersecting a (min_lon, min_lat, max_lon, max_lat) bounding box"""
+    min_lon, min_lat, max_lon, max_lat = bounds
+
+    for z in range(min_zoom, max_zoom + 1):
+        min_x, min_y = lonlat_to_tile(min_lon, max_lat, z)
+        max_x, max_y = lonlat_to_tile(max_lon, min_lat, z)
+
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                yield z, x, y
+
+
+def get_country_bounds(country_iso):
+    extent = func.ST_Extent(Boundary.geom)
+    stmt = select(func.ST_XMin(extent), func.ST_YMin(extent), func.ST_XMax(extent), func.ST_YMax(extent)) \
+        .where(Boundary.country_iso == country_iso)
+
+    bounds = db.session.execute(stmt).first()
+
+    if bounds is None or bounds[0] is None:
+        return None
+
+    return tuple(bounds)
+
+
+def pregenerate_tiles(country_isos=None, min_zoom=TILE_CACHE_MIN_ZOOM, max_zoom=TILE_CACHE_MAX_ZOOM):
+    """Render the tiles of the latest forecast of each country into the tile cache.
+
+    Tiles of an older init_date are dropped in the same transaction, so the cache never mixes two runs.
+    """
+    stmt = select(LatestForecast)
+
+    if country_isos:
+        stmt = stmt.where(LatestForecast.country_iso.in_(country_isos))
+
+    latest_forecasts = db.session.execute(stmt).scalars().all()
+
+    for latest_forecast in latest_forecasts:
+        iso = latest_forecast.country_iso
+        init_date = latest_forecast.init_date
+
+        bounds = get_country_bounds(iso)
+
+        if not bounds:
+            logging.info(f"[TILES]: No boundaries for {iso}, skipping")
+            continue
+
+        tiles = list(iter_tiles(bounds, min_zoom, max_zoom))
+
+        with transaction("pregenerate_tiles"):
+            db.session.execute(delete(TileCache).where(TileCache.country_iso == iso,
+                                                       TileCache.init_date != init_date))
+
+            for day in range(3):
+                forecast_date = init_date + timedelta(days=day)
+
+                for i in range(0, len(tiles), RENDER_BATCH_SIZE):
+                    batch = tiles[i:i + RENDER_BATCH_SIZE]
+                    zs, xs, ys = (list(values) for values in zip(*batch))
+
+                    db.session.execute(render_tiles_sql, {
+                        "iso": iso,
+                        "forecast_date": forecast_date,
+                        "init_date": init_date,
+                        "zs": zs,
+                        "xs": xs,
+                        "ys": ys,
+                    })
+
+        logging.info(f"[TILES]: Rendered {len(tiles) * 3} tiles for {iso} and init date {init_date}")
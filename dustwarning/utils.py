@@ -1,19 +1,36 @@
+import hashlib
 import json
 import logging
 import os
+import random
 import shutil
 import stat
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
+import ijson
 import requests
+from requests.adapters import HTTPAdapter
 
 from dustwarning.config import SETTINGS
 from dustwarning.errors import WarningsNotFound, WarningsRequestError
+from dustwarning.metrics import FETCH_BYTES, FETCH_SECONDS, record_cache
+from dustwarning.response_cache import ResponseCache
 
 STATE_DIR = SETTINGS.get("STATE_DIR")
 STATE_FILE = os.path.join(STATE_DIR, "state.json")
 VERIFY_SSL = SETTINGS.get("VERIFY_SSL", True)
+FETCH_CONCURRENCY = SETTINGS.get("FETCH_CONCURRENCY", 8)
+FETCH_TIMEOUT = SETTINGS.get("FETCH_TIMEOUT", 30)
+RESPONSE_CACHE_DIR = os.path.join(STATE_DIR, "cache")
+
+_session = None
+_session_lock = threading.Lock()
+_response_cache = None
 
 
 def copy_with_metadata(source, target):
@@ -90,19 +107,179 @@ def update_state(last_update):
     atomic_write(json.dumps(state, indent=4), STATE_FILE)
 
 
+def read_ingestion_state(init_date):
+    """Per country and day status of the given init_date, as {iso: {day_val: {status, payload_hash, ...}}}"""
+    state = read_state()
+    
+    return state.get("ingestion", {}).get(init_date, {})
+
+
+def update_ingestion_state(init_date, ingestion_state):
+    state = read_state()
+    
+    # only the init_date being loaded can still be resumed
+    state.update({"ingestion": {init_date: ingestion_state}})
+    
+    atomic_write(json.dumps(state, indent=4), STATE_FILE)
+
+
+def retry_delay(attempt, min_delay, max_delay):
+    """Exponential backoff, half of it jittered so that retries from several processes do not run in step"""
+    delay = min(max_delay, min_delay * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
 def get_next_day(datetime_str):
     input_datetime = datetime.fromisoformat(datetime_str)
     next_day = input_datetime + timedelta(days=1)
     return next_day.replace(hour=0, minute=0, second=0, microsecond=0)
 
 
-def get_json_warnings(url):
+def get_http_session():
+    """Shared keep-alive session, with a connection pool sized for the fetch concurrency"""
+    global _session
+    
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=FETCH_CONCURRENCY, pool_maxsize=FETCH_CONCURRENCY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    
+    return _session
+
+
+def get_response_cache():
+    global _response_cache
+    
+    with _session_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(RESPONSE_CACHE_DIR,
+                                            max_age_days=SETTINGS.get("RESPONSE_CACHE_MAX_AGE_DAYS", 7),
+                                            max_size_mb=SETTINGS.get("RESPONSE_CACHE_MAX_SIZE_MB", 100))
+    
+    return _response_cache
+
+
+def download_warnings(url, session, timeout, cache, conditional=True):
+    """Download a warning file into the response cache, sending the validators of the cached copy.
+
+    Returns the cache entry for the url, which is left unchanged when the server answers 304. Only a 304 counts
+    as a cache hit, saving the size of the cached body, and any downloaded body as a miss. When the cached body
+    is removed before the 304 is answered, the file is downloaded again without validators.
+    """
+    headers = cache.conditional_headers(url) if conditional else {}
+    
+    with session.get(url, headers=headers, verify=VERIFY_SSL, timeout=timeout, stream=True) as response:
+        if response.status_code == 304:
+            # raise_for_status lets a 304 through, whose empty body would be cached as the file
+            if not headers:
+                raise WarningsRequestError(f"Error fetching warnings for {url}: 304 to an unconditional request")
+            
+            entry = cache.get_entry(url)
+            
+            if entry is not None:
+                cache.touch(url)
+                cache.record_hit(bytes_saved=entry.get("size", 0))
+                record_cache("response", hit=True)
+                return entry
+        else:
+            response.raise_for_status()  # Raises HTTPError for bad responses (4xx or 5xx)
+            
+            sha256 = hashlib.sha256()
+            size = 0
+            
+            with cache.new_temp_file() as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    sha256.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            
+            payload_hash = sha256.hexdigest()
+            
+            cache.record_miss()
+            record_cache("response", hit=False)
+            FETCH_BYTES.labels(host=urlparse(url).hostname or "").inc(size)
+            
+            cache.store(url, f.name, payload_hash, size,
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"))
+            
+            return cache.get_entry(url)
+    
+    logging.warning(f"[CACHE]: Cached body of {url} removed before its 304, downloading it again")
+    
+    return download_warnings(url, session, timeout, cache, conditional=False)
+
+
+def get_warnings_file(url, session=None, timeout=FETCH_TIMEOUT):
+    """Fetch a warning file, returning the path of its cached copy and the sha256 of the payload"""
+    if session is None:
+        session = get_http_session()
+    
+    cache = get_response_cache()
+    
     try:
-        response = requests.get(url, verify=VERIFY_SSL)
-        response.raise_for_status()  # Raises HTTPError for bad responses (4xx or 5xx)
-        return response.json()
+        entry = download_warnings(url, session, timeout, cache)
     except requests.exceptions.HTTPError as err:
         if err.response.status_code == 404:
             raise WarningsNotFound(f"Warnings not found for {url}")
         else:
             raise WarningsRequestError(f"Error fetching warnings for {url}")
+    except requests.exceptions.RequestException as err:
+        raise WarningsRequestError(f"Error fetching warnings for {url}: {err}")
+    
+    payload_hash = entry.get("sha256")
+    
+    return cache.object_path(payload_hash), payload_hash
+
+
+def iter_geojson_features(f):
+    """Yield the features of a GeoJSON FeatureCollection one at a time from a binary file object.
+
+    Only the current feature is held in memory, whatever the size of the file.
+    """
+    return ijson.items(f, "features.item", use_float=True)
+
+
+def fetch_warnings_files(urls, max_workers=FETCH_CONCURRENCY, timeout=FETCH_TIMEOUT, labels=None, durations=None):
+    """Fetch several warning files concurrently.
+
+    Returns a dict mapping each url to either a (file_path, payload_hash) tuple or the exception raised while
+    fetching it, so that the caller decides how a failed url affects the rest. labels maps urls to the
+    country_iso and day labels of their fetch latency metric, and durations, when given, receives the
+    fetch time of each url in seconds.
+    """
+    session = get_http_session()
+    cache = get_response_cache()
+    labels = labels or {}
+    
+    def fetch(url):
+        start = time.perf_counter()
+        outcome = "ok"
+        
+        try:
+            return get_warnings_file(url, session=session, timeout=timeout)
+        except Exception as e:
+            outcome = type(e).__name__
+            return e
+        finally:
+            elapsed = time.perf_counter() - start
+            url_labels = labels.get(url, {})
+            FETCH_SECONDS.labels(country_iso=url_labels.get("country_iso", ""), day=url_labels.get("day", ""),
+                                 outcome=outcome).observe(elapsed)
+            if durations is not None:
+                durations[url] = elapsed
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = dict(zip(urls, executor.map(fetch, urls)))
+    
+    # the files just fetched are read by the caller after this returns
+    cache.evict(keep=[url for url, result in results.items() if not isinstance(result, Exception)])
+    cache.save()
+    
+    stats = cache.stats
+    logging.info(f"[CACHE]: hits={stats['hits']} misses={stats['misses']} bytes_saved={stats['bytes_saved']}")
+    
+    return results
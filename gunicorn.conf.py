@@ -0,0 +1,18 @@
+import os
+import shutil
+
+
+def on_starting(server):
+    # metrics files of the previous run would be added to the new counters
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,43 @@
+"""Latest forecast per country
+
+Revision ID: 3a7c5e0f9b12
+Revises: 8f4b1d6e2a90
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a7c5e0f9b12'
+down_revision = '8f4b1d6e2a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('aemet_latest_forecast',
+    sa.Column('country_iso', sa.String(length=3), nullable=False),
+    sa.Column('init_date', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('country_iso')
+    )
+    with op.batch_alter_table('aemet_dust_warning', schema=None) as batch_op:
+        batch_op.create_index('idx_aemet_dust_warning_init_forecast_gid', ['init_date', 'forecast_date', 'gid'], unique=False)
+
+    # seed from the warnings already loaded
+    op.execute("""
+        INSERT INTO aemet_latest_forecast (country_iso, init_date, updated_at)
+        SELECT b.country_iso, MAX(w.init_date), now()
+        FROM aemet_dust_warning w
+        JOIN aemet_country_boundary b ON b.gid = w.gid
+        GROUP BY b.country_iso
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('aemet_dust_warning', schema=None) as batch_op:
+        batch_op.drop_index('idx_aemet_dust_warning_init_forecast_gid')
+
+    op.drop_table('aemet_latest_forecast')
@@ -0,0 +1,49 @@
+"""Forecast events and webhook deliveries
+
+Revision ID: 5b9e2f7a1c84
+Revises: d82b6f1e4c39
+Create Date: 2026-10-18 14:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9e2f7a1c84'
+down_revision = 'd82b6f1e4c39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('aemet_forecast_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('init_date', sa.DateTime(), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('aemet_webhook_delivery',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=2048), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('delivered_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['aemet_forecast_event.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('aemet_webhook_delivery', schema=None) as batch_op:
+        batch_op.create_index('ix_aemet_webhook_delivery_pending', ['next_attempt_at'], unique=False,
+                              postgresql_where=sa.text('delivered_at IS NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('aemet_webhook_delivery', schema=None) as batch_op:
+        batch_op.drop_index('ix_aemet_webhook_delivery_pending', postgresql_where=sa.text('delivered_at IS NULL'))
+
+    op.drop_table('aemet_webhook_delivery')
+    op.drop_table('aemet_forecast_event')
@@ -0,0 +1,35 @@
+"""Boundary simplified geometries
+
+Revision ID: 5c2e9a7d41f3
+Revises: 11b15148079b
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from geoalchemy2 import Geometry
+
+# revision identifiers, used by Alembic.
+revision = '5c2e9a7d41f3'
+down_revision = '11b15148079b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('aemet_country_boundary', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geom_low', Geometry(geometry_type='MULTIPOLYGON', srid=4326, spatial_index=False, from_text='ST_GeomFromEWKT', name='geometry'), nullable=True))
+        batch_op.add_column(sa.Column('geom_medium', Geometry(geometry_type='MULTIPOLYGON', srid=4326, spatial_index=False, from_text='ST_GeomFromEWKT', name='geometry'), nullable=True))
+
+    # fill in the simplified geometries of the boundaries already loaded
+    op.execute("""
+        UPDATE aemet_country_boundary
+        SET geom_low = ST_Multi(ST_SimplifyPreserveTopology(geom, 0.02)),
+            geom_medium = ST_Multi(ST_SimplifyPreserveTopology(geom, 0.002))
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('aemet_country_boundary', schema=None) as batch_op:
+        batch_op.drop_column('geom_medium')
+        batch_op.drop_column('geom_low')
@@ -0,0 +1,102 @@
+"""Partition aemet_dust_warning by init_date
+
+Revision ID: 7d3f0b2c6e58
+Revises: e9a2f3c8d714
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3f0b2c6e58'
+down_revision = 'e9a2f3c8d714'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # move the existing table out of the way, keeping its sequence for the new one
+    op.execute("""
+        ALTER TABLE aemet_dust_warning RENAME TO aemet_dust_warning_old;
+        ALTER TABLE aemet_dust_warning_old RENAME CONSTRAINT aemet_dust_warning_pkey TO aemet_dust_warning_old_pkey;
+        ALTER TABLE aemet_dust_warning_old RENAME CONSTRAINT unique_dust_warming_date TO unique_dust_warming_date_old;
+        ALTER INDEX idx_aemet_dust_warning_init_forecast_gid RENAME TO idx_aemet_dust_warning_old_init_forecast_gid;
+        ALTER SEQUENCE aemet_dust_warning_id_seq OWNED BY NONE;
+    """)
+
+    # the partition key has to be part of every unique constraint, hence the (id, init_date) primary key
+    op.execute("""
+        CREATE TABLE aemet_dust_warning (
+            id integer NOT NULL DEFAULT nextval('aemet_dust_warning_id_seq'),
+            gid varchar(256) NOT NULL,
+            init_date timestamp without time zone NOT NULL,
+            forecast_date timestamp without time zone NOT NULL,
+            value integer NOT NULL,
+            CONSTRAINT aemet_dust_warning_pkey PRIMARY KEY (id, init_date),
+            CONSTRAINT unique_dust_warming_date UNIQUE (gid, init_date, forecast_date),
+            CONSTRAINT aemet_dust_warning_gid_fkey FOREIGN KEY (gid)
+                REFERENCES aemet_country_boundary (gid) ON DELETE CASCADE
+        ) PARTITION BY RANGE (init_date);
+
+        CREATE INDEX idx_aemet_dust_warning_init_forecast_gid
+            ON aemet_dust_warning (init_date, forecast_date, gid);
+    """)
+
+    # one partition per month already holding warnings
+    op.execute("""
+        DO $$
+        DECLARE
+            month date;
+        BEGIN
+            FOR month IN SELECT DISTINCT date_trunc('month', init_date)::date FROM aemet_dust_warning_old LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF aemet_dust_warning FOR VALUES FROM (%L) TO (%L)',
+                    'aemet_dust_warning_' || to_char(month, 'YYYY_MM'), month, (month + interval '1 month')::date
+                );
+            END LOOP;
+        END
+        $$;
+    """)
+
+    op.execute("""
+        INSERT INTO aemet_dust_warning (id, gid, init_date, forecast_date, value)
+        SELECT id, gid, init_date, forecast_date, value FROM aemet_dust_warning_old;
+
+        DROP TABLE aemet_dust_warning_old;
+
+        ALTER SEQUENCE aemet_dust_warning_id_seq OWNED BY aemet_dust_warning.id;
+    """)
+
+
+def downgrade():
+    op.execute("""
+        ALTER TABLE aemet_dust_warning RENAME TO aemet_dust_warning_partitioned;
+        ALTER TABLE aemet_dust_warning_partitioned RENAME CONSTRAINT aemet_dust_warning_pkey TO aemet_dust_warning_partitioned_pkey;
+        ALTER TABLE aemet_dust_warning_partitioned RENAME CONSTRAINT unique_dust_warming_date TO unique_dust_warming_date_partitioned;
+        ALTER INDEX idx_aemet_dust_warning_init_forecast_gid RENAME TO idx_aemet_dust_warning_partitioned_init_forecast_gid;
+        ALTER SEQUENCE aemet_dust_warning_id_seq OWNED BY NONE;
+    """)
+
+    op.create_table('aemet_dust_warning',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('aemet_dust_warning_id_seq')"), nullable=False),
+    sa.Column('gid', sa.String(length=256), nullable=False),
+    sa.Column('init_date', sa.DateTime(), nullable=False),
+    sa.Column('forecast_date', sa.DateTime(), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['gid'], ['aemet_country_boundary.gid'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('gid', 'init_date', 'forecast_date', name='unique_dust_warming_date')
+    )
+    with op.batch_alter_table('aemet_dust_warning', schema=None) as batch_op:
+        batch_op.create_index('idx_aemet_dust_warning_init_forecast_gid', ['init_date', 'forecast_date', 'gid'], unique=False)
+
+    op.execute("""
+        INSERT INTO aemet_dust_warning (id, gid, init_date, forecast_date, value)
+        SELECT id, gid, init_date, forecast_date, value FROM aemet_dust_warning_partitioned;
+
+        DROP TABLE aemet_dust_warning_partitioned CASCADE;
+
+        ALTER SEQUENCE aemet_dust_warning_id_seq OWNED BY aemet_dust_warning.id;
+    """)
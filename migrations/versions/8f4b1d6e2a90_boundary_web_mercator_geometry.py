@@ -0,0 +1,47 @@
+"""Boundary Web Mercator geometry
+
+Revision ID: 8f4b1d6e2a90
+Revises: 5c2e9a7d41f3
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from geoalchemy2 import Geometry
+
+# revision identifiers, used by Alembic.
+revision = '8f4b1d6e2a90'
+down_revision = '5c2e9a7d41f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('aemet_country_boundary', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geom_3857', Geometry(geometry_type='MULTIPOLYGON', srid=3857, spatial_index=False, from_text='ST_GeomFromEWKT', name='geometry'), nullable=True))
+
+    op.execute("UPDATE aemet_country_boundary SET geom_3857 = ST_Transform(geom, 3857)")
+
+    # the simplified geometries are only used for tiles, store them in Web Mercator too
+    op.execute("""
+        ALTER TABLE aemet_country_boundary
+            ALTER COLUMN geom_low TYPE geometry(MULTIPOLYGON, 3857) USING ST_Transform(geom_low, 3857),
+            ALTER COLUMN geom_medium TYPE geometry(MULTIPOLYGON, 3857) USING ST_Transform(geom_medium, 3857)
+    """)
+
+    with op.batch_alter_table('aemet_country_boundary', schema=None) as batch_op:
+        batch_op.create_geospatial_index('idx_aemet_country_boundary_geom_3857', ['geom_3857'], unique=False, postgresql_using='gist', postgresql_ops={})
+
+
+def downgrade():
+    with op.batch_alter_table('aemet_country_boundary', schema=None) as batch_op:
+        batch_op.drop_geospatial_index('idx_aemet_country_boundary_geom_3857', postgresql_using='gist', column_name='geom_3857')
+
+    op.execute("""
+        ALTER TABLE aemet_country_boundary
+            ALTER COLUMN geom_low TYPE geometry(MULTIPOLYGON, 4326) USING ST_Transform(geom_low, 4326),
+            ALTER COLUMN geom_medium TYPE geometry(MULTIPOLYGON, 4326) USING ST_Transform(geom_medium, 4326)
+    """)
+
+    with op.batch_alter_table('aemet_country_boundary', schema=None) as batch_op:
+        batch_op.drop_column('geom_3857')
@@ -0,0 +1,36 @@
+"""Forecast skill
+
+Revision ID: a65e1c9f3b07
+Revises: 7d3f0b2c6e58
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a65e1c9f3b07'
+down_revision = '7d3f0b2c6e58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('aemet_forecast_skill',
+    sa.Column('country_iso', sa.String(length=3), nullable=False),
+    sa.Column('forecast_date', sa.DateTime(), nullable=False),
+    sa.Column('lead', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('reference_lead', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('regions', sa.Integer(), nullable=False),
+    sa.Column('agree', sa.Integer(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.Column('misses', sa.Integer(), nullable=False),
+    sa.Column('false_alarms', sa.Integer(), nullable=False),
+    sa.Column('correct_negatives', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('country_iso', 'forecast_date', 'lead', 'reference_lead')
+    )
+
+
+def downgrade():
+    op.drop_table('aemet_forecast_skill')
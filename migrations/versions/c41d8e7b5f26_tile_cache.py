@@ -0,0 +1,34 @@
+"""Tile cache
+
+Revision ID: c41d8e7b5f26
+Revises: 3a7c5e0f9b12
+Create Date: 2026-10-18 09:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d8e7b5f26'
+down_revision = '3a7c5e0f9b12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('aemet_tile_cache',
+    sa.Column('country_iso', sa.String(length=3), nullable=False),
+    sa.Column('forecast_date', sa.DateTime(), nullable=False),
+    sa.Column('z', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('x', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('y', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('init_date', sa.DateTime(), nullable=False),
+    sa.Column('tile', sa.LargeBinary(), nullable=False),
+    sa.Column('etag', sa.String(length=32), nullable=False),
+    sa.PrimaryKeyConstraint('country_iso', 'forecast_date', 'z', 'x', 'y')
+    )
+
+
+def downgrade():
+    op.drop_table('aemet_tile_cache')
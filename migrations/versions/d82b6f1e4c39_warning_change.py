@@ -0,0 +1,32 @@
+"""Warning change sets
+
+Revision ID: d82b6f1e4c39
+Revises: a65e1c9f3b07
+Create Date: 2026-10-18 11:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd82b6f1e4c39'
+down_revision = 'a65e1c9f3b07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('aemet_warning_change',
+    sa.Column('init_date', sa.DateTime(), nullable=False),
+    sa.Column('gid', sa.String(length=256), nullable=False),
+    sa.Column('forecast_date', sa.DateTime(), nullable=False),
+    sa.Column('lead_day', sa.Integer(), nullable=False),
+    sa.Column('previous_value', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('init_date', 'gid', 'forecast_date')
+    )
+
+
+def downgrade():
+    op.drop_table('aemet_warning_change')
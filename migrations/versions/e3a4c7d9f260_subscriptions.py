@@ -0,0 +1,64 @@
+"""Alert subscriptions and notifications
+
+Revision ID: e3a4c7d9f260
+Revises: 5b9e2f7a1c84
+Create Date: 2026-10-18 16:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a4c7d9f260'
+down_revision = '5b9e2f7a1c84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('aemet_subscription',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=256), nullable=False),
+    sa.Column('country_iso', sa.String(length=3), nullable=True),
+    sa.Column('gid', sa.String(length=256), nullable=True),
+    sa.Column('threshold', sa.Integer(), nullable=False),
+    sa.Column('lead_days', postgresql.ARRAY(sa.Integer()), nullable=True),
+    sa.Column('sink', sa.String(length=32), nullable=False),
+    sa.Column('target', sa.String(length=2048), nullable=True),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.CheckConstraint('country_iso IS NOT NULL OR gid IS NOT NULL', name='ck_aemet_subscription_area'),
+    sa.ForeignKeyConstraint(['gid'], ['aemet_country_boundary.gid'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('aemet_notification',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('gid', sa.String(length=256), nullable=False),
+    sa.Column('init_date', sa.DateTime(), nullable=False),
+    sa.Column('forecast_date', sa.DateTime(), nullable=False),
+    sa.Column('lead_day', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['subscription_id'], ['aemet_subscription.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('subscription_id', 'gid', 'forecast_date', name='unique_notification_forecast')
+    )
+    with op.batch_alter_table('aemet_webhook_delivery', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+        batch_op.alter_column('event_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.create_check_constraint('ck_aemet_webhook_delivery_body', 'event_id IS NOT NULL OR payload IS NOT NULL')
+
+
+def downgrade():
+    op.execute("DELETE FROM aemet_webhook_delivery WHERE event_id IS NULL")
+
+    with op.batch_alter_table('aemet_webhook_delivery', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_aemet_webhook_delivery_body', type_='check')
+        batch_op.alter_column('event_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('payload')
+
+    op.drop_table('aemet_notification')
+    op.drop_table('aemet_subscription')
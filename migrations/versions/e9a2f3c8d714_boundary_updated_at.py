@@ -0,0 +1,28 @@
+"""Boundary updated_at
+
+Revision ID: e9a2f3c8d714
+Revises: c41d8e7b5f26
+Create Date: 2026-10-18 09:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9a2f3c8d714'
+down_revision = 'c41d8e7b5f26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('aemet_country_boundary', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE aemet_country_boundary SET updated_at = now()")
+
+
+def downgrade():
+    with op.batch_alter_table('aemet_country_boundary', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
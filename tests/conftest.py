@@ -0,0 +1,91 @@
+"""Fixtures of the test suite, run with `python -m pytest` from the repository root.
+
+The settings are read when dustwarning is imported, so they are set here first. Nothing connects to the database,
+the tests replacing the functions that would.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="dustwarning-tests-")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "postgresql+psycopg2://dustwarning@localhost/dustwarning")
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+os.environ.pop("WEBHOOK_URLS", None)
+os.environ.pop("WEBHOOK_SECRET", None)
+
+
+class WarningsHandler(BaseHTTPRequestHandler):
+    """Serves a one region warnings file for any path, after the delay and with the status set for that path.
+
+    The file has the ETag of its properties, answered 304 when it matches If-None-Match.
+    """
+
+    def do_GET(self):
+        time.sleep(self.server.delays.get(self.path, 0))
+
+        etag = '"%s"' % hashlib.sha1(json.dumps(self.server.properties, sort_keys=True).encode()).hexdigest()
+
+        status = self.server.statuses.get(self.path, 200)
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            status = 304
+
+        self.server.requests.append(self.path)
+        self.server.validators.append(self.headers.get("If-None-Match"))
+
+        if status != 200:
+            self.send_error(status)
+            return
+
+        body = json.dumps({"type": "FeatureCollection", "features": [
+            {"type": "Feature", "properties": self.server.properties, "geometry": None}
+        ]}).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def warnings_server():
+    """A stub of the AEMET file server. Set its delays and statuses by path, and read the paths it was asked for
+    along with the If-None-Match header of each request"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WarningsHandler)
+    server.daemon_threads = True
+    server.delays = {}
+    server.statuses = {}
+    server.requests = []
+    server.validators = []
+    server.properties = {"HASC_1": "XX.01", "ADM1_PCODE": "XX01", "NAME_1": "Region", "ADM1_FR": "Region",
+                         "value": 2}
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def state_file(tmp_path, monkeypatch):
+    """An empty state file of its own for each test"""
+    from dustwarning import utils
+
+    path = str(tmp_path / "state.json")
+    monkeypatch.setattr(utils, "STATE_FILE", path)
+
+    return path
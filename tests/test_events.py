@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+
+from dustwarning import app, asgi, events
+from webhook_receiver import WebhookReceiver
+
+SECRET = "test-secret"
+PAYLOAD = {"event": "forecast", "init_date": "2025-03-01T00:00:00Z",
+           "countries": [{"country_iso": "BFA", "changed_regions": ["BFA_BF.BO"]}]}
+
+
+@pytest.fixture
+def receiver(monkeypatch):
+    monkeypatch.setattr(events, "WEBHOOK_SECRET", SECRET)
+
+    receiver = WebhookReceiver(secret=SECRET).start()
+    yield receiver
+    receiver.stop()
+
+
+@pytest.fixture
+def deliveries(monkeypatch):
+    """deliver_webhooks without the database, returning the mock of the outcomes it records"""
+    claim = mock.Mock(return_value=[])
+    record = mock.Mock()
+
+    monkeypatch.setattr(events, "claim_deliveries", claim)
+    monkeypatch.setattr(events, "record_deliveries", record)
+
+    return claim, record
+
+
+def test_deliveries_are_signed(receiver):
+    delivered, failed = events.post_deliveries([(1, receiver.url, 0, 7, PAYLOAD)])
+
+    assert (delivered, failed) == ([1], [])
+
+    [delivery] = receiver.deliveries
+    assert delivery["signed"]
+    assert delivery["delivery_id"] == "1"
+    assert delivery["event"] == "forecast"
+    assert delivery["payload"] == {"id": 7, **PAYLOAD}
+
+    body = json.dumps(delivery["payload"], separators=(",", ":")).encode()
+    assert delivery["signature"] == "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_deliveries_are_not_signed_without_secret(receiver, monkeypatch):
+    monkeypatch.setattr(events, "WEBHOOK_SECRET", None)
+
+    events.post_deliveries([(1, receiver.url, 0, None, {"event": "alert", "subscription_id": 3})])
+
+    [delivery] = receiver.deliveries
+    assert delivery["signature"] is None
+    assert delivery["event"] == "alert"
+    assert "id" not in delivery["payload"]
+
+
+def test_failed_delivery_is_retried_with_backoff(receiver, deliveries):
+    claim, record = deliveries
+    receiver.statuses = [500]
+
+    claim.return_value = [(1, receiver.url, 0, 7, PAYLOAD)]
+    assert events.deliver_webhooks() == (0, 1)
+
+    [(delivered, [failed]), _] = record.call_args
+    assert delivered == []
+    assert failed["delivery_id"] == 1
+    assert failed["failed_attempts"] == 1
+    assert "500" in failed["error"]
+    # the first retry waits between half and all of the minimum delay
+    min_delay = timedelta(seconds=events.WEBHOOK_RETRY_MIN_DELAY)
+    assert min_delay / 2 <= failed["delay"] <= min_delay
+
+    # the next run claims it again once due
+    claim.return_value = [(1, receiver.url, 1, 7, PAYLOAD)]
+    assert events.deliver_webhooks() == (1, 0)
+    record.assert_called_with([1], [])
+
+    assert [delivery["delivery_id"] for delivery in receiver.deliveries] == ["1", "1"]
+
+
+def test_backoff_grows_up_to_the_maximum_delay(receiver, deliveries):
+    claim, record = deliveries
+    receiver.statuses = [500, 500]
+
+    claim.return_value = [(1, receiver.url, 3, 7, PAYLOAD), (2, receiver.url, 8, 7, PAYLOAD)]
+    events.deliver_webhooks()
+
+    [(_, [third, last]), _] = record.call_args
+    delay = timedelta(seconds=events.WEBHOOK_RETRY_MIN_DELAY * 2 ** 3)
+    assert delay / 2 <= third["delay"] <= delay
+
+    max_delay = timedelta(seconds=events.WEBHOOK_RETRY_MAX_DELAY)
+    assert max_delay / 2 <= last["delay"] <= max_delay
+
+
+def test_no_due_delivery_records_nothing(deliveries):
+    claim, record = deliveries
+
+    assert events.deliver_webhooks() == (0, 0)
+    record.assert_not_called()
+
+
+def stream(monkeypatch, headers, stored_events):
+    """The messages of one event stream over the stored (id, payload) events, which ends after one poll"""
+    monkeypatch.setattr(asgi, "EVENTS_STREAM_SECONDS", 0)
+
+    async def get_last_event_id():
+        return max((event_id for event_id, payload in stored_events), default=0)
+
+    async def execute(stmt, params=None):
+        assert stmt is events.EVENTS_AFTER_STMT
+        return [(event_id, payload) for event_id, payload in stored_events if event_id > params["event_id"]]
+
+    monkeypatch.setattr(asgi, "get_last_event_id", get_last_event_id)
+    monkeypatch.setattr(asgi, "execute", execute)
+
+    messages = []
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/api/v1/events", "headers": headers}
+    asyncio.run(asgi.stream_events(scope, receive, send))
+
+    return messages
+
+
+def test_stream_resumes_after_last_event_id(monkeypatch):
+    stored_events = [(event_id, {**PAYLOAD, "init_date": f"2025-03-0{event_id}T00:00:00Z"})
+                     for event_id in range(1, 6)]
+
+    messages = stream(monkeypatch, [(b"last-event-id", b"3")], stored_events)
+
+    assert messages[0]["status"] == 200
+    body = b"".join(message.get("body", b"") for message in messages[1:]).decode()
+
+    assert [line for line in body.splitlines() if line.startswith("id: ")] == ["id: 4", "id: 5"]
+    assert events.format_event(4, stored_events[3][1]) in body
+    assert not messages[-1]["more_body"]
+
+
+def test_stream_without_last_event_id_only_sends_new_events(monkeypatch):
+    messages = stream(monkeypatch, [], [(1, PAYLOAD), (2, PAYLOAD)])
+
+    body = b"".join(message.get("body", b"") for message in messages[1:]).decode()
+
+    assert "id: " not in body
+    assert ": keep-alive" in body
+
+
+def test_stream_rejects_malformed_last_event_id(monkeypatch):
+    messages = stream(monkeypatch, [(b"last-event-id", b"abc")], [])
+
+    assert messages[0]["status"] == 400
+
+
+def flask_stream(monkeypatch, headers, stored_events):
+    """The response of the /api/v1/events route of the Flask app, which ends after one poll"""
+    monkeypatch.setattr(events, "EVENTS_STREAM_SECONDS", 0)
+    monkeypatch.setattr(events, "get_last_event_id",
+                        lambda: max((event_id for event_id, payload in stored_events), default=0))
+    monkeypatch.setattr(events, "get_events_after",
+                        lambda last_event_id: [event for event in stored_events if event[0] > last_event_id])
+
+    return app.test_client().get("/api/v1/events", headers=headers)
+
+
+def test_flask_stream_resumes_after_last_event_id(monkeypatch):
+    stored_events = [(event_id, PAYLOAD) for event_id in range(1, 6)]
+
+    response = flask_stream(monkeypatch, {"Last-Event-ID": "3"}, stored_events)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+
+    body = response.get_data(as_text=True)
+    assert [line for line in body.splitlines() if line.startswith("id: ")] == ["id: 4", "id: 5"]
+
+
+def test_flask_stream_rejects_malformed_last_event_id(monkeypatch):
+    response = flask_stream(monkeypatch, {"Last-Event-ID": "abc"}, [])
+
+    assert response.status_code == 400
@@ -0,0 +1,26 @@
+import logging
+import os
+
+from dustwarning.handlers import PACKAGE_DIR, PackageFilter
+
+
+def make_record(name, pathname):
+    return logging.LogRecord(name, logging.INFO, pathname, 1, "message", None, None)
+
+
+def test_package_filter_passes_package_records():
+    package_filter = PackageFilter()
+
+    assert package_filter.filter(make_record("root", os.path.join(PACKAGE_DIR, "ingest.py")))
+    assert package_filter.filter(make_record("dustwarning", "/usr/lib/python3/site-packages/flask/app.py"))
+    assert package_filter.filter(make_record("dustwarning.asgi", os.path.join(PACKAGE_DIR, "asgi.py")))
+
+
+def test_package_filter_drops_third_party_records():
+    package_filter = PackageFilter()
+
+    for name in ["werkzeug", "sqlalchemy.engine.Engine", "urllib3.connectionpool"]:
+        assert not package_filter.filter(make_record(name, f"/usr/lib/python3/site-packages/{name}.py"))
+
+    # a sibling directory sharing the package prefix
+    assert not package_filter.filter(make_record("root", PACKAGE_DIR + "_extra/module.py"))
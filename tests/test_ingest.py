@@ -0,0 +1,141 @@
+import contextlib
+import os
+import time
+from unittest import mock
+
+import pytest
+import requests
+
+from dustwarning import ingest
+from dustwarning.errors import WarningsRequestError
+from dustwarning.mapping import boundary_config
+from dustwarning.response_cache import ResponseCache
+from dustwarning.utils import download_warnings, fetch_warnings_files, read_ingestion_state
+
+
+def test_fetch_takes_about_the_slowest_request(warnings_server, state_file):
+    delays = [0.2, 0.4, 0.6, 0.8, 1.0]
+    urls = []
+
+    for i, delay in enumerate(delays):
+        path = f"/concurrent/{i}.geojson"
+        warnings_server.delays[path] = delay
+        urls.append(warnings_server.base_url + path)
+
+    start = time.perf_counter()
+    results = fetch_warnings_files(urls, max_workers=len(urls))
+    elapsed = time.perf_counter() - start
+
+    assert not [result for result in results.values() if isinstance(result, Exception)]
+    assert elapsed >= max(delays)
+    # the serial sum would be 3 seconds
+    assert elapsed < max(delays) + 0.5
+
+
+def test_unchanged_file_is_answered_from_the_cache(warnings_server, tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    url = warnings_server.base_url + "/BFA/20250301_1.geojson"
+
+    with requests.Session() as session:
+        entry = download_warnings(url, session, 5, cache)
+        assert download_warnings(url, session, 5, cache) == entry
+
+    assert warnings_server.validators == [None, entry["etag"]]
+    assert cache.index["stats"]["hits"] == 1
+
+
+def test_removed_cached_body_is_downloaded_again(warnings_server, tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path))
+    url = warnings_server.base_url + "/BFA/20250301_1.geojson"
+
+    with requests.Session() as session:
+        entry = download_warnings(url, session, 5, cache)
+
+        conditional_headers = cache.conditional_headers
+
+        def remove_body_after_reading_validators(url):
+            headers = conditional_headers(url)
+            os.remove(cache.object_path(entry["sha256"]))
+            return headers
+
+        # the body is pruned between reading the validators and the 304
+        monkeypatch.setattr(cache, "conditional_headers", remove_body_after_reading_validators)
+
+        assert download_warnings(url, session, 5, cache)["sha256"] == entry["sha256"]
+
+    assert warnings_server.validators == [None, entry["etag"], None]
+    assert os.path.isfile(cache.object_path(entry["sha256"]))
+
+
+def test_unconditional_304_is_an_error(warnings_server, tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    path = "/BFA/20250301_1.geojson"
+    warnings_server.statuses[path] = 304
+
+    with requests.Session() as session, pytest.raises(WarningsRequestError):
+        download_warnings(warnings_server.base_url + path, session, 5, cache)
+
+    assert cache.get_entry(warnings_server.base_url + path) is None
+
+
+@contextlib.contextmanager
+def no_transaction(name):
+    yield
+
+
+@pytest.fixture
+def load(warnings_server, state_file, monkeypatch):
+    """Ingestion of BFA and SEN from the stub server, the database writes being replaced by mocks"""
+    configs = {}
+    for iso in ("BFA", "SEN"):
+        configs[iso] = {**boundary_config[iso],
+                        "geojson_url_template": warnings_server.base_url + f"/{iso}/{{date_str}}_{{day_val}}.geojson"}
+
+    monkeypatch.setattr(ingest, "COUNTRY_ISO_CODES", ["BFA", "SEN"])
+    monkeypatch.setattr(ingest, "transaction", no_transaction)
+    monkeypatch.setattr(ingest, "get_next_init_date", lambda: ingest.datetime(2025, 3, 1))
+
+    writes = mock.Mock()
+    writes.upsert_warnings.side_effect = lambda rows: list(range(len(rows)))
+    writes.record_warning_changes.return_value = 0
+    writes.notify_subscribers.return_value = 0
+    writes.get_new_countries.side_effect = lambda init_date, countries: countries
+
+    for name in ("ensure_warning_partition", "upsert_warnings", "record_warning_changes", "notify_subscribers",
+                 "record_forecast_event", "get_new_countries", "update_latest_forecasts", "update_forecast_skill",
+                 "render_tiles", "db"):
+        monkeypatch.setattr(ingest, name, getattr(writes, name))
+
+    with mock.patch.dict(boundary_config, configs):
+        yield writes
+
+
+def test_country_with_a_failing_day_commits_nothing(load, warnings_server):
+    warnings_server.statuses["/SEN/20250301_1.geojson"] = 500
+
+    assert ingest.ingest_warnings(check_window=False) == ingest.INCOMPLETE
+
+    rows = load.upsert_warnings.call_args.args[0]
+    assert {row["gid"].split("_")[0] for row in rows} == {"BFA"}
+    assert len(rows) == 3
+    load.update_latest_forecasts.assert_called_once_with(["BFA"], ingest.datetime(2025, 3, 1))
+
+    state = read_ingestion_state("2025-03-01T00:00:00")
+    assert {day: piece["status"] for day, piece in state["BFA"].items()} == \
+           {"0": "committed", "1": "committed", "2": "committed"}
+    assert {day: piece["status"] for day, piece in state["SEN"].items()} == \
+           {"0": "fetched", "1": "failed", "2": "fetched"}
+
+
+def test_next_run_only_fetches_the_missing_country(load, warnings_server):
+    warnings_server.statuses["/SEN/20250301_1.geojson"] = 500
+    ingest.ingest_warnings(check_window=False)
+
+    del warnings_server.statuses["/SEN/20250301_1.geojson"]
+    warnings_server.requests.clear()
+
+    assert ingest.ingest_warnings(check_window=False) == ingest.COMPLETE
+
+    assert sorted(warnings_server.requests) == [f"/SEN/20250301_{day}.geojson" for day in "012"]
+    rows = load.upsert_warnings.call_args.args[0]
+    assert {row["gid"].split("_")[0] for row in rows} == {"SEN"}
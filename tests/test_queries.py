@@ -0,0 +1,38 @@
+import asyncio
+from datetime import datetime
+
+from dustwarning import asgi
+from dustwarning.queries import warnings_cache
+
+INIT_DATE = datetime(2025, 3, 1)
+
+
+def get_warnings(monkeypatch, updated_at, value):
+    """The ETag and payload of the async warnings endpoint, for a forecast of BFA loaded at updated_at"""
+
+    async def get_latest_forecasts():
+        return {"BFA": (INIT_DATE, updated_at)}
+
+    async def execute(stmt, params=None):
+        return [("BFA_BF.BO", "Boucle du Mouhoun", value)]
+
+    monkeypatch.setattr(asgi, "get_latest_forecasts", get_latest_forecasts)
+    monkeypatch.setattr(asgi, "execute", execute)
+
+    scope = {"type": "http", "method": "GET", "headers": []}
+    response = asyncio.run(asgi.get_warnings(scope, "bfa", "2025-03-02"))
+
+    return response.headers["etag"], response.body
+
+
+def test_reloading_an_init_date_refreshes_the_warnings(monkeypatch):
+    warnings_cache.clear()
+
+    etag, body = get_warnings(monkeypatch, datetime(2025, 3, 1, 12, 10), 1)
+    reloaded_etag, reloaded_body = get_warnings(monkeypatch, datetime(2025, 3, 1, 14, 30), 3)
+
+    assert reloaded_etag != etag
+    assert b'"value":3' in reloaded_body
+
+    # the same load is served from the cache
+    assert get_warnings(monkeypatch, datetime(2025, 3, 1, 14, 30), 4) == (reloaded_etag, reloaded_body)
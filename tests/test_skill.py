@@ -0,0 +1,49 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from dustwarning.skill import MISSING, compute_skill, iter_country_values
+
+FORECAST_DATE = datetime(2025, 3, 3)
+
+
+def make_rows(seed=0):
+    """Shuffled (country_iso, gid, init_date, value) rows of three countries, a fifth of them missing"""
+    rng = random.Random(seed)
+    rows = []
+
+    for country_iso, regions in [("BFA", 13), ("MLI", 9), ("NER", 8)]:
+        for i in range(regions):
+            for lead in range(3):
+                if rng.random() < 0.2:
+                    continue
+                rows.append((country_iso, f"{country_iso}_{i}", FORECAST_DATE - timedelta(days=lead),
+                             rng.randrange(4)))
+
+    rng.shuffle(rows)
+
+    return rows
+
+
+def test_country_values_match_rows():
+    rows = make_rows()
+
+    country_values = dict(iter_country_values(rows, FORECAST_DATE))
+
+    assert sorted(country_values) == ["BFA", "MLI", "NER"]
+
+    for country_iso, values in country_values.items():
+        gids = sorted({gid for iso, gid, _, _ in rows if iso == country_iso})
+        expected = np.full((len(gids), 3), MISSING, dtype=np.int8)
+
+        for iso, gid, init_date, value in rows:
+            if iso == country_iso:
+                expected[gids.index(gid), (FORECAST_DATE - init_date).days] = value
+
+        np.testing.assert_array_equal(values, expected)
+        assert compute_skill(values) == compute_skill(expected)
+
+
+def test_no_rows_yields_nothing():
+    assert list(iter_country_values([], FORECAST_DATE)) == []
@@ -0,0 +1,54 @@
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from dustwarning import app
+from dustwarning.routes.api.v1 import dustwarning_router
+from dustwarning.stats import MISSING, WarningsHistory, history_cache, stats_cache
+
+INIT_DATE = datetime(2025, 3, 1)
+
+
+def make_history(value):
+    dates = np.datetime64("2024-01-01") + np.arange(400)
+    values = np.full((2, len(dates), 3), value, dtype=np.int8)
+    values[1, ::7, :] = MISSING
+
+    return WarningsHistory(["BFA_BF.BO", "BFA_BF.CE"], ["Boucle du Mouhoun", "Centre-Est"], dates, values)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    history_cache.clear()
+    stats_cache.clear()
+
+    latest = {"BFA": (INIT_DATE, datetime(2025, 3, 1, 12, 10))}
+    monkeypatch.setattr(dustwarning_router, "get_latest_forecasts", lambda: latest)
+
+    with app.test_client() as client:
+        client.latest = latest
+        yield client
+
+
+def test_reloading_an_init_date_refreshes_the_stats(client, monkeypatch):
+    load = mock.Mock(return_value=make_history(1))
+    monkeypatch.setattr(WarningsHistory, "load", load)
+
+    response = client.get("/api/v1/stats/bfa")
+    assert response.status_code == 200
+    assert response.json["regions"][0]["monthly_exceedance"]["1"] == 0
+
+    # the same load is served from the caches, and conditionally
+    assert client.get("/api/v1/stats/bfa", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert load.call_count == 1
+
+    load.return_value = make_history(3)
+    client.latest["BFA"] = (INIT_DATE, datetime(2025, 3, 1, 14, 30))
+
+    reloaded = client.get("/api/v1/stats/bfa", headers={"If-None-Match": response.headers["ETag"]})
+    assert reloaded.status_code == 200
+    assert reloaded.headers["ETag"] != response.headers["ETag"]
+    assert reloaded.json["regions"][0]["monthly_exceedance"]["1"] == 1
+    assert load.call_count == 2
@@ -0,0 +1,94 @@
+"""Stub webhook receiver, checking the signature of each delivery.
+
+It is used by the webhook tests, and can be run locally to watch the deliveries of a development setup:
+
+    python tests/webhook_receiver.py --port 9000 --secret <WEBHOOK_SECRET>
+
+with WEBHOOK_URLS=http://localhost:9000/ set for deliver_webhooks.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        receiver = self.server.receiver
+
+        delivery = {
+            "event": self.headers.get("X-Dustwarning-Event"),
+            "delivery_id": self.headers.get("X-Dustwarning-Delivery"),
+            "signature": self.headers.get("X-Dustwarning-Signature"),
+            "signed": receiver.verify(body, self.headers.get("X-Dustwarning-Signature")),
+            "payload": json.loads(body),
+        }
+
+        with receiver.lock:
+            receiver.deliveries.append(delivery)
+            status = receiver.statuses.pop(0) if receiver.statuses else 200
+
+        if receiver.verbose:
+            print(f"{status} {json.dumps(delivery)}", flush=True)
+
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WebhookReceiver:
+    """Records the deliveries it receives, answering each with the next of statuses, 200 once they run out"""
+
+    def __init__(self, secret=None, host="127.0.0.1", port=0, verbose=False):
+        self.secret = secret
+        self.verbose = verbose
+        self.statuses = []
+        self.deliveries = []
+        self.lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), WebhookHandler)
+        self.server.daemon_threads = True
+        self.server.receiver = self
+        self.url = f"http://{host}:{self.server.server_port}/"
+
+    def verify(self, body, signature):
+        """Whether the signature header matches the HMAC-SHA256 of the body, False when no secret is set"""
+        if not self.secret or not signature:
+            return False
+
+        expected = "sha256=" + hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+
+        return hmac.compare_digest(expected, signature)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--secret", default=None, help="WEBHOOK_SECRET of the deliveries, to check their signature")
+    parser.add_argument("--fail", type=int, default=0, help="Answer 500 to that many deliveries first")
+    args = parser.parse_args()
+
+    receiver = WebhookReceiver(secret=args.secret, host=args.host, port=args.port, verbose=True)
+    receiver.statuses = [500] * args.fail
+
+    print(f"Receiving webhooks on {receiver.url}", flush=True)
+
+    try:
+        receiver.server.serve_forever()
+    except KeyboardInterrupt:
+        receiver.server.server_close()